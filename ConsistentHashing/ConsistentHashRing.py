@@ -1,5 +1,20 @@
-import hashlib
 import bisect
+import json
+import math
+import os
+import struct
+from collections import OrderedDict
+from mmap import mmap as MemoryMap, ACCESS_READ
+
+import numpy as np
+
+from hashers import get_hasher
+from rebalance_planner import plan_rebalance
+
+SNAPSHOT_MAGIC = b'CHRING01'
+# magic, hasher name, position item size, number of positions, metadata offset, metadata length
+SNAPSHOT_HEADER = struct.Struct('<8s16sIQQQ')
+SNAPSHOT_DATA_OFFSET = 64  # positions start on an aligned offset after the header
 
 class ConsistentHashRing:
     """
@@ -7,111 +22,656 @@ class ConsistentHashRing:
 
     Pseudocode/Algorithm:
     ---------------------
-    - __init__(num_replicas):
-        Initialize the ring, sorted list, and server set. num_replicas is the number of virtual nodes per server.
+    - __init__(num_replicas, hasher):
+        Initialize the position arrays, server table and server set. num_replicas is the number of virtual nodes per server.
+        hasher picks the hash function (see hashers.py); the default 'md5' reproduces the original placements.
     - _hash(key):
-        Hash the key using MD5 and return as integer.
-    - add_server(server_id):
-        For each virtual node, hash its key, add to ring and sorted list.
-    - remove_server(server_id):
-        For each virtual node, remove from ring and sorted list.
+        Hash the key with the configured hasher and return as integer.
+    - add_server(server_id) / add_servers(server_ids):
+        Hash all virtual nodes in one batch, sort them, and merge them into the sorted position array
+        with a single np.insert (one O(n) memory move per call instead of one list insert per vnode).
+    - add_server(server_id, weight) / set_weight(server_id, weight):
+        A server gets round(num_replicas * weight) virtual nodes, numbered server_id#0, server_id#1, ...
+        Changing the weight only adds or removes the vnodes past the smaller of the old and new counts.
+    - remove_server(server_id) / remove_servers(server_ids):
+        Drop every position owned by the server(s) with one vectorized delete.
     - get_server(key):
-        Hash the key, use bisect to find the next node clockwise in sorted_keys. Wrap around if needed. Return the server.
+        Hash the key, bisect a cached list of the positions as Python ints to find the next node clockwise
+        (a plain bisect beats a NumPy call for one key). Wrap around if needed. Return the server.
+        With cache_size set, results are kept in a bounded LRU cache tagged with the ring epoch. Every membership
+        change bumps the epoch, so stale entries are detected and replaced lazily on their next lookup.
+    - get_servers(keys):
+        Hash all keys at once, then use NumPy searchsorted against the ring positions
+        to find the next node clockwise for every key in a single vectorized call.
     - distribute_keys(keys):
-        For each key, find its server and group keys by server.
+        Look up every key with get_servers and group keys by server.
+        In bounded-load mode, a key whose server is already at capacity walks clockwise to the next server below it.
+    - plan_add_servers(server_ids) / plan_remove_servers(server_ids):
+        Return the hash ranges that would change owner, as (start, end, old_server, new_server), without
+        touching any keys (see rebalance_planner.plan_rebalance).
+    - get_servers_for_key(key, n, zone_aware) / get_servers_for_keys(keys, n, zone_aware):
+        Preference list for replication: the first n distinct physical servers clockwise from the key.
+        With zone_aware, servers in zones not yet used are preferred, then the list is filled with any other
+        distinct servers. The batch form reads rows of a per-position table built with vectorized passes
+        (cached until the ring changes); the per-key form bisects once and walks only until n servers are found.
+    - save(path) / load(path, mmap):
+        Binary snapshot: a fixed header, the sorted positions array, the int32 owner array, then a small JSON
+        table (server ids, weights, zones). load maps the file read-only so many processes share one copy of
+        the arrays through the page cache and lookups run directly on the mapped buffer.
+    - assign(key) / release(key):
+        Bounded-load mode for live traffic. assign places one key on the first server clockwise whose load is below
+        ceil(load_factor * (assigned keys + 1) * weight / total weight) and records it; release frees the slot again.
 
         PSEUDOCODE:
         Class ConsistentHashRing:
-            Method __init__(num_replicas = 3):
+            Method __init__(num_replicas = 3, hasher = 'md5'):
                 Set self.num_replicas = num_replicas
-                Set self.ring = empty dictionary  // maps hash value to server id
-                Set self.sorted_keys = empty list // sorted list of all hash values (positions on the ring)
-                Set self.servers = empty set      // set of server ids
+                Set self.hasher = hasher strategy looked up by name
+                Set self._positions = empty array    // sorted positions of all virtual nodes on the ring
+                Set self._owners = empty array       // self._owners[i] = server table slot owning self._positions[i]
+                Set self.server_table = empty list   // slot -> server id
+                Set self.servers = empty set         // set of server ids
 
             Method _hash(key):
                 Convert key to string and encode as utf-8
-                Compute MD5 hash of the encoded key
+                Compute the hasher's digest of the encoded key (128-bit MD5, or a 64-bit hash)
                 Convert the hash to an integer and return it
 
-            Method add_server(server_id):
-                Add server_id to self.servers
-                For i from 0 to self.num_replicas - 1:
-                    virtual_node_key = server_id + "#" + str(i)
-                    h = self._hash(virtual_node_key)
-                    Set self.ring[h] = server_id
-                    Insert h into self.sorted_keys, keeping it sorted
-
-            Method remove_server(server_id):
-                Remove server_id from self.servers
-                For i from 0 to self.num_replicas - 1:
-                    virtual_node_key = server_id + "#" + str(i)
-                    h = self._hash(virtual_node_key)
-                    If h in self.ring:
-                        Delete self.ring[h]
-                        Remove h from self.sorted_keys
+            Method add_servers(server_ids):
+                new_positions = empty list, new_owners = empty list
+                For each server_id in server_ids:
+                    slot = free slot in self.server_table for server_id
+                    For i from 0 to self.num_replicas - 1:
+                        Append hash(server_id + "#" + str(i)) to new_positions and slot to new_owners
+                Sort new_positions (and new_owners with them)
+                at = searchsorted(self._positions, new_positions)
+                Insert new_positions / new_owners into self._positions / self._owners at indices `at`
+
+            Method remove_servers(server_ids):
+                slots = server table slots of server_ids, then free them
+                keep = self._owners not in slots
+                self._positions = self._positions[keep], self._owners = self._owners[keep]
 
             Method get_server(key):
-                If self.ring is empty:
+                If the ring is empty:
                     Return None
                 h = self._hash(key)
-                idx = index in self.sorted_keys where h would fit (using bisect)
-                If idx == length of self.sorted_keys:
+                idx = bisect(self._positions as a list of ints, h)
+                If idx == length of self._positions:
                     idx = 0  // wrap around the ring
-                Return self.ring[self.sorted_keys[idx]]
+                Return self.server_table[self._owners[idx]]
+
+            Method get_servers(keys):
+                If the ring is empty:
+                    Return an empty array
+                hashes = array of self._hash(key) for each key
+                idx = searchsorted(self._positions, hashes, side=right) mod length of self._positions
+                Return self._owners[idx]  // index into self.server_table
 
             Method distribute_keys(keys):
                 mapping = dictionary mapping each server in self.servers to an empty list
-                For each key in keys:
-                    server = self.get_server(key)
-                    Append key to mapping[server]
+                indices = self.get_servers(keys)
+                For each key, index in zip(keys, indices):
+                    Append key to mapping[self.server_table[index]]
                 Return mapping
+
+            Method assign(key):  // bounded-load mode
+                capacity = self.load_factor * (total assigned + 1) / total weight of all servers
+                idx = searchsorted(self._positions, self._hash(key), side=right)
+                While load of server self._owners[idx] >= capacity * weight of that server:
+                    idx = (idx + 1) mod length of self._positions  // walk clockwise past full servers
+                Record key -> server, increment the server's load
+                Return the server
+
+            Method release(key):
+                Forget key's assignment and decrement its server's load
     This approach ensures minimal data movement when adding/removing servers and balances load using virtual nodes.
     """
-    def __init__(self, num_replicas=3):
+    def __init__(self, num_replicas=3, hasher='md5', load_factor=None, cache_size=None):
         """
-        num_replicas: Number of virtual nodes per server (for better distribution)
+        num_replicas: Number of virtual nodes per server of weight 1 (for better distribution)
+        hasher: Name of a hash function from hashers.HASHERS ('md5', 'md5_64', 'blake2b', 'fnv1a')
+                or a hasher instance. 'md5' is the legacy 128-bit mode; the others use 64-bit positions.
+        load_factor: Enables bounded-load mode when set (e.g. 1.25): no server is given more than
+                     load_factor times the mean load (per unit of weight) by assign or distribute_keys. Must be >= 1.
+        cache_size: Enables an LRU cache of key -> server in front of get_server holding up to this many keys.
         """
+        if load_factor is not None and load_factor < 1:
+            raise ValueError("load_factor must be at least 1")
         self.num_replicas = num_replicas
-        self.ring = dict()  # hash value -> server id
-        self.sorted_keys = []  # sorted list of hash values
+        self.hasher = get_hasher(hasher)
+        self.load_factor = load_factor
+        self.cache_size = cache_size
+        self.epoch = 0  # bumped on every membership change
+        self._cache = OrderedDict()  # key -> (epoch, server id)
+        self._cache_hits = 0
+        self._cache_misses = 0
         self.servers = set()
+        self.server_table = []  # slot -> server id (None for a freed slot)
+        self._server_slots = dict()  # server id -> slot
+        self._free_slots = []
+        self._positions = np.empty(0, dtype=self.hasher.dtype)  # sorted vnode positions
+        self._owners = np.empty(0, dtype=np.int32)  # server slot of each position
+        self._high_words = None  # cached top 64 bits of 128-bit positions, rebuilt lazily
+        self._position_list = None  # cached positions as Python ints for single-key bisect, rebuilt lazily
+        self._owner_list = None  # cached self._owners as a Python list, rebuilt with self._position_list
+        self._preference_tables = dict()  # (n, zone_aware) -> per-position preference list table
+        self._num_zones = None  # cached number of distinct zones
+        self._zones = dict()  # server id -> zone / rack label
+        self._weights = []  # slot -> weight
+        self._vnode_counts = []  # slot -> number of virtual nodes
+        self._total_weight = 0
+        self._loads = []  # slot -> number of keys placed with assign
+        self._slot_keys = []  # slot -> set of keys placed with assign
+        self._assignments = dict()  # key -> slot
+
+    @property
+    def sorted_keys(self):
+        """Sorted list of all vnode positions on the ring (as ints)."""
+        return self.hasher.to_ints(self._positions)
+
+    @property
+    def ring(self):
+        """Mapping of vnode position -> server id."""
+        return dict(zip(self.sorted_keys, (self.server_table[o] for o in self._owners.tolist())))
 
     def _hash(self, key):
         """Return a hash value for a given key (as int)."""
-        h = hashlib.md5(str(key).encode('utf-8')).hexdigest()
-        return int(h, 16)
+        return self.hasher.hash(key)
+
+    def _hash_many(self, keys):
+        """Return the hash values of many keys as a NumPy array (uint64, or 'S16' for legacy MD5)."""
+        return self.hasher.hash_many(keys)
 
-    def add_server(self, server_id):
-        """Add a server and its virtual nodes to the ring."""
+    def _claim_slot(self, server_id):
+        slot = self._free_slots.pop() if self._free_slots else len(self.server_table)
+        if slot == len(self.server_table):
+            self.server_table.append(server_id)
+            self._loads.append(0)
+            self._slot_keys.append(set())
+            self._weights.append(0)
+            self._vnode_counts.append(0)
+        else:
+            self.server_table[slot] = server_id
+        self._server_slots[server_id] = slot
         self.servers.add(server_id)
-        for i in range(self.num_replicas):
-            virtual_node_key = f"{server_id}#{i}"
-            h = self._hash(virtual_node_key)
-            self.ring[h] = server_id
-            bisect.insort(self.sorted_keys, h)
+        return slot
+
+    def _release_slot(self, server_id):
+        slot = self._server_slots.pop(server_id)
+        self._zones.pop(server_id, None)
+        self.server_table[slot] = None
+        self._total_weight -= self._weights[slot]
+        self._weights[slot] = 0
+        self._vnode_counts[slot] = 0
+        self._free_slots.append(slot)
+        self.servers.discard(server_id)
+        return slot
+
+    def _vnode_keys(self, server_id, start, stop):
+        return [f"{server_id}#{i}" for i in range(start, stop)]
+
+    def _vnode_count(self, weight):
+        if weight <= 0:
+            raise ValueError("Server weight must be positive")
+        return max(1, round(self.num_replicas * weight))
+
+    def _insert_positions(self, positions, owners):
+        """Merge unsorted (positions, owners) into the sorted ring arrays in one pass."""
+        order = np.argsort(positions, kind='stable')
+        positions, owners = positions[order], owners[order]
+        at = np.searchsorted(self._positions, positions, side='right')
+        self._positions = np.insert(self._positions, at, positions)
+        self._owners = np.insert(self._owners, at, owners)
+        self._invalidate_caches()
+
+    def _invalidate_caches(self):
+        """Drop lookup structures derived from the position arrays after the ring changes."""
+        self.epoch += 1  # cached get_server results from older epochs are now stale
+        self._high_words = None
+        self._position_list = None
+        self._owner_list = None
+        self._preference_tables = dict()
+        self._num_zones = None
+
+    def add_server(self, server_id, zone=None, weight=1):
+        """
+        Add a server and its virtual nodes to the ring. zone optionally names its zone or rack.
+        weight scales the number of virtual nodes with the server's capacity (e.g. cores).
+        """
+        self.add_servers([server_id], zones=None if zone is None else {server_id: zone},
+                         weights={server_id: weight})
+
+    def add_servers(self, server_ids, zones=None, weights=None):
+        """
+        Add many servers at once; the position arrays are merged only once.
+        zones: Optional mapping of server id -> zone / rack label, used by zone-aware preference lists.
+        weights: Optional mapping of server id -> weight (default 1).
+        """
+        server_ids = [s for s in dict.fromkeys(server_ids) if s not in self._server_slots]
+        if not server_ids:
+            return
+        weights = weights or {}
+        counts = [self._vnode_count(weights.get(s, 1)) for s in server_ids]
+        if zones:
+            self._zones.update((s, zones[s]) for s in server_ids if s in zones)
+        vnode_keys = []
+        owners = []
+        for server_id, count in zip(server_ids, counts):
+            slot = self._claim_slot(server_id)
+            self._weights[slot] = weights.get(server_id, 1)
+            self._vnode_counts[slot] = count
+            self._total_weight += self._weights[slot]
+            vnode_keys.extend(self._vnode_keys(server_id, 0, count))
+            owners.extend([slot] * count)
+        self._insert_positions(self._hash_many(vnode_keys), np.array(owners, dtype=np.int32))
+
+    def get_weight(self, server_id):
+        """Return the weight of a server."""
+        return self._weights[self._server_slots[server_id]]
+
+    def set_weight(self, server_id, weight):
+        """
+        Change a server's weight. Only the virtual nodes between the old and new vnode counts are
+        added or removed, so only the key ranges next to those vnodes move.
+        """
+        slot = self._server_slots[server_id]
+        old_count, new_count = self._vnode_counts[slot], self._vnode_count(weight)
+        self._total_weight += weight - self._weights[slot]
+        self._weights[slot] = weight
+        self._vnode_counts[slot] = new_count
+        if new_count > old_count:
+            hashes = self._hash_many(self._vnode_keys(server_id, old_count, new_count))
+            self._insert_positions(hashes, np.full(len(hashes), slot, dtype=np.int32))
+        elif new_count < old_count:
+            hashes = np.sort(self._hash_many(self._vnode_keys(server_id, new_count, old_count)))
+            lo = np.searchsorted(self._positions, hashes, side='left')
+            hi = np.searchsorted(self._positions, hashes, side='right')
+            # Pick this server's entry among positions equal to each hash (collisions are vanishingly rare).
+            drop = [next(i for i in range(a, b) if self._owners[i] == slot) for a, b in zip(lo.tolist(), hi.tolist())]
+            self._positions = np.delete(self._positions, drop)
+            self._owners = np.delete(self._owners, drop)
+            self._invalidate_caches()
 
     def remove_server(self, server_id):
         """Remove a server and its virtual nodes from the ring."""
-        self.servers.discard(server_id)
-        for i in range(self.num_replicas):
-            virtual_node_key = f"{server_id}#{i}"
-            h = self._hash(virtual_node_key)
-            if h in self.ring:
-                del self.ring[h]
-                self.sorted_keys.remove(h)
+        self.remove_servers([server_id])
+
+    def copy(self):
+        """Return an independent copy of the ring's membership and positions (assign() state is not copied)."""
+        clone = ConsistentHashRing(self.num_replicas, self.hasher, self.load_factor, self.cache_size)
+        clone.servers = set(self.servers)
+        clone.server_table = list(self.server_table)
+        clone._server_slots = dict(self._server_slots)
+        clone._free_slots = list(self._free_slots)
+        clone._zones = dict(self._zones)
+        clone._weights = list(self._weights)
+        clone._vnode_counts = list(self._vnode_counts)
+        clone._total_weight = self._total_weight
+        clone._positions = self._positions.copy()
+        clone._owners = self._owners.copy()
+        clone._loads = [0] * len(self.server_table)
+        clone._slot_keys = [set() for _ in self.server_table]
+        return clone
+
+    def save(self, path):
+        """
+        Write the ring to a compact binary snapshot that load() can memory-map.
+        Layout: header | positions (uint64 little-endian, or 16-byte MD5 digests) | owners (int32) | JSON metadata.
+        Server ids and zones must be JSON-serializable (str or int).
+        """
+        positions = self._positions.astype(self._positions.dtype.newbyteorder('<'), copy=False)
+        owners = self._owners.astype('<i4', copy=False)
+        metadata = json.dumps({
+            'num_replicas': self.num_replicas,
+            'load_factor': self.load_factor,
+            'server_table': self.server_table,
+            'weights': self._weights,
+            'vnode_counts': self._vnode_counts,
+            'zones': [[s, z] for s, z in self._zones.items()],
+        }).encode('utf-8')
+        metadata_offset = SNAPSHOT_DATA_OFFSET + positions.nbytes + owners.nbytes
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.hasher.name.encode('ascii'), positions.itemsize,
+                                      len(positions), metadata_offset, len(metadata))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header.ljust(SNAPSHOT_DATA_OFFSET, b'\0'))
+            f.write(positions.tobytes())
+            f.write(owners.tobytes())
+            f.write(metadata)
+        os.replace(tmp_path, path)  # readers never see a half-written snapshot
+
+    @classmethod
+    def load(cls, path, mmap=True, cache_size=None):
+        """
+        Load a ring written by save(). With mmap=True the position and owner arrays are read-only views
+        of a shared memory mapping instead of private copies. Later membership changes on the loaded ring
+        build new private arrays and leave the file untouched.
+        """
+        with open(path, 'rb') as f:
+            buffer = MemoryMap(f.fileno(), 0, access=ACCESS_READ) if mmap else f.read()
+        magic, hasher_name, itemsize, num_positions, metadata_offset, metadata_length = \
+            SNAPSHOT_HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a ConsistentHashRing snapshot")
+        metadata = json.loads(bytes(buffer[metadata_offset:metadata_offset + metadata_length]).decode('utf-8'))
+
+        ring = cls(metadata['num_replicas'], hasher_name.rstrip(b'\0').decode('ascii'),
+                   metadata['load_factor'], cache_size)
+        dtype = ring.hasher.dtype.newbyteorder('<')
+        if dtype.itemsize != itemsize:
+            raise ValueError(f"Snapshot position size {itemsize} does not match hasher '{ring.hasher.name}'")
+        ring._positions = np.frombuffer(buffer, dtype=dtype, count=num_positions, offset=SNAPSHOT_DATA_OFFSET)
+        ring._owners = np.frombuffer(buffer, dtype='<i4', count=num_positions,
+                                     offset=SNAPSHOT_DATA_OFFSET + num_positions * itemsize)
+
+        ring.server_table = metadata['server_table']
+        ring._weights = metadata['weights']
+        ring._vnode_counts = metadata['vnode_counts']
+        ring._zones = {s: z for s, z in metadata['zones']}
+        ring._total_weight = sum(ring._weights)
+        for slot, server_id in enumerate(ring.server_table):
+            if server_id is None:
+                ring._free_slots.append(slot)
+            else:
+                ring._server_slots[server_id] = slot
+                ring.servers.add(server_id)
+        ring._loads = [0] * len(ring.server_table)
+        ring._slot_keys = [set() for _ in ring.server_table]
+        return ring
+
+    def plan_add_servers(self, server_ids):
+        """Return the (start, end, old_server, new_server) hash ranges that adding server_ids would move."""
+        new_ring = self.copy()
+        new_ring.add_servers(server_ids)
+        return plan_rebalance(self, new_ring)
+
+    def plan_remove_servers(self, server_ids):
+        """Return the (start, end, old_server, new_server) hash ranges that removing server_ids would move."""
+        new_ring = self.copy()
+        new_ring.remove_servers(server_ids)
+        return plan_rebalance(self, new_ring)
+
+    def remove_servers(self, server_ids):
+        """
+        Remove many servers at once with a single pass over the position arrays.
+        Keys placed on the removed servers with assign are re-assigned to the remaining servers.
+        """
+        slots = [self._release_slot(s) for s in dict.fromkeys(server_ids) if s in self._server_slots]
+        if not slots:
+            return
+        keep = ~np.isin(self._owners, slots)
+        self._positions = self._positions[keep]
+        self._owners = self._owners[keep]
+        self._invalidate_caches()
+        orphans = []
+        for slot in slots:
+            orphans.extend(self._slot_keys[slot])
+            for key in self._slot_keys[slot]:
+                del self._assignments[key]
+            self._slot_keys[slot] = set()
+            self._loads[slot] = 0
+        for key in orphans:
+            self.assign(key)
 
     def get_server(self, key):
         """Get the server responsible for a given key."""
-        if not self.ring:
+        if self.cache_size is None:
+            return self._find_server(key)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == self.epoch:
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+            return entry[1]
+        self._cache_misses += 1
+        server = self._find_server(key)
+        self._cache[key] = (self.epoch, server)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return server
+
+    def _bisect(self, key):
+        """Return the index of the next position clockwise from one key's hash (without wrap-around)."""
+        if self._position_list is None:
+            self._position_list = self.hasher.to_ints(self._positions)
+            self._owner_list = self._owners.tolist()
+        return bisect.bisect(self._position_list, self.hasher.hash(key))
+
+    def _find_server(self, key):
+        if len(self._positions) == 0:
             return None
-        h = self._hash(key)
-        idx = bisect.bisect(self.sorted_keys, h) % len(self.sorted_keys)
-        return self.ring[self.sorted_keys[idx]]
+        idx = self._bisect(key)
+        if idx == len(self._position_list):
+            idx = 0  # wrap around the ring
+        return self.server_table[self._owner_list[idx]]
+
+    def cache_info(self):
+        """Return hit/miss counters and the current size of the get_server cache."""
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'hit_ratio': self._cache_hits / lookups if lookups else 0.0,
+            'size': len(self._cache),
+            'capacity': self.cache_size,
+            'epoch': self.epoch,
+        }
+
+    def hash_keys(self, keys):
+        """Hash a batch of keys once so the result can be routed repeatedly with lookup_hashes."""
+        return self._hash_many(keys)
+
+    def _search(self, hashes):
+        """Return, for every key hash, the index of the next position clockwise (without wrap-around)."""
+        if self._positions.dtype == np.uint64:
+            return np.searchsorted(self._positions, np.asarray(hashes, dtype=np.uint64), side='right')
+        if self._high_words is None:
+            # Searching the top 64 bits as native integers is much faster than comparing 16-byte strings.
+            self._high_words = self._positions.view('>u8')[::2].astype(np.uint64)
+        high_words = self._high_words
+        hashes = np.ascontiguousarray(hashes, dtype='S16')
+        key_high = hashes.view('>u8')[::2].astype(np.uint64)
+        idx = np.searchsorted(high_words, key_high, side='right')
+        # Keys that share their top 64 bits with a ring position need the full 128-bit comparison.
+        tie = (idx > 0) & (high_words[idx - 1] == key_high)
+        if tie.any():
+            idx[tie] = np.searchsorted(self._positions, hashes[tie], side='right')
+        return idx
+
+    def lookup_hashes(self, hashes):
+        """Return the server_table index of the owner of every hash in an array of key hashes."""
+        if len(self._positions) == 0:
+            return np.empty(0, dtype=np.int32)
+        idx = self._search(hashes)
+        idx[idx == len(self._positions)] = 0  # wrap around the ring
+        return self._owners[idx]
+
+    def get_servers(self, keys):
+        """
+        Batch version of get_server.
+        Returns a NumPy array holding, for each key, the index of its server in server_table.
+        """
+        if len(self._positions) == 0:
+            return np.empty(0, dtype=np.int32)
+        return self.lookup_hashes(self._hash_many(keys))
 
     def distribute_keys(self, keys):
-        """Return a mapping of server_id -> list of keys assigned to it."""
+        """
+        Return a mapping of server_id -> list of keys assigned to it.
+        In bounded-load mode no server receives more than ceil(load_factor * len(keys) * weight / total weight) keys.
+        """
         mapping = {s: [] for s in self.servers}
-        for key in keys:
-            server = self.get_server(key)
-            mapping[server].append(key)
+        if len(self._positions) == 0:
+            return mapping
+        keys = list(keys)
+        server_table = self.server_table
+        if self.load_factor is None:
+            for key, idx in zip(keys, self.get_servers(keys).tolist()):
+                mapping[server_table[idx]].append(key)
+            return mapping
+
+        idx = self._search(self._hash_many(keys)) % len(self._positions)
+        capacity = self._capacity(len(keys))
+        limits = [capacity * w for w in self._weights]
+        loads = [0] * len(server_table)
+        for key, i, slot in zip(keys, idx.tolist(), self._owners[idx].tolist()):
+            if loads[slot] >= limits[slot]:
+                slot = self._walk(i, loads, capacity)
+            loads[slot] += 1
+            mapping[server_table[slot]].append(key)
         return mapping
+
+    def _zone_ids(self):
+        """Return an array mapping each server slot to an integer zone id; servers without a zone get their own."""
+        labels = dict()
+        zone_ids = np.empty(len(self.server_table), dtype=np.int64)
+        for slot, server_id in enumerate(self.server_table):
+            label = self._zones.get(server_id, ('server', slot))
+            zone_ids[slot] = labels.setdefault(label, len(labels))
+        return zone_ids
+
+    def _zone_count(self):
+        """Number of distinct zones among current servers (a server without a zone counts as its own zone)."""
+        if self._num_zones is None:
+            self._num_zones = len({self._zones.get(s, ('server', s)) for s in self.servers})
+        return self._num_zones
+
+    def _preference_table(self, n, zone_aware):
+        """
+        Return a (positions, n) array whose row i lists the first n distinct server slots clockwise from position i.
+        Built with vectorized passes: at step k every unfinished row looks at the owner k positions ahead and
+        keeps it if it is new to the row. A zone-aware table first takes servers from unused zones, then fills
+        the remaining columns with any other distinct servers.
+        """
+        cache_key = (n, zone_aware)
+        if cache_key in self._preference_tables:
+            return self._preference_tables[cache_key]
+        num_positions = len(self._positions)
+        n = min(n, len(self.servers))
+        table = np.full((num_positions, n), -1, dtype=np.int32)
+        filled = np.zeros(num_positions, dtype=np.int64)
+        columns = np.arange(n)
+
+        passes = []
+        if zone_aware:
+            passes.append((self._zone_ids(), min(n, self._zone_count())))
+        passes.append((None, n))
+
+        for zone_ids, target in passes:
+            active = np.flatnonzero(filled < target)
+            step = 0
+            while len(active) and step < num_positions:
+                candidate = self._owners[(active + step) % num_positions]
+                chosen = table[active]
+                in_row = columns[None, :] < filled[active][:, None]
+                if zone_ids is None:
+                    duplicate = ((chosen == candidate[:, None]) & in_row).any(axis=1)
+                else:
+                    duplicate = ((zone_ids[chosen] == zone_ids[candidate][:, None]) & in_row).any(axis=1)
+                rows = active[~duplicate]
+                table[rows, filled[rows]] = candidate[~duplicate]
+                filled[rows] += 1
+                active = active[filled[active] < target]
+                step += 1
+        self._preference_tables[cache_key] = table
+        return table
+
+    def get_servers_for_keys(self, keys, n, zone_aware=False):
+        """
+        Batch preference lists. Returns a (len(keys), min(n, number of servers)) array whose row lists,
+        as server_table indices, the distinct servers that should hold replicas of that key, in order.
+        """
+        if len(self._positions) == 0:
+            return np.empty((0, 0), dtype=np.int32)
+        idx = self._search(self._hash_many(keys)) % len(self._positions)
+        return self._preference_table(n, zone_aware)[idx]
+
+    def get_servers_for_key(self, key, n, zone_aware=False):
+        """
+        Return the first n distinct physical servers clockwise from the key (its replica preference list).
+        With zone_aware=True, servers from zones not already in the list are preferred.
+        """
+        if len(self._positions) == 0:
+            return []
+        idx = self._bisect(key) % len(self._positions)
+        cached = self._preference_tables.get((n, zone_aware))
+        if cached is not None:
+            return [self.server_table[slot] for slot in cached[idx].tolist()]
+
+        n = min(n, len(self.servers))
+        num_positions = len(self._positions)
+        chosen = []
+        if zone_aware:
+            zones_used = set()
+            step = 0
+            while len(chosen) < min(n, self._zone_count()) and step < num_positions:
+                server_id = self.server_table[self._owners[(idx + step) % num_positions]]
+                zone = self._zones.get(server_id, ('server', server_id))
+                if zone not in zones_used:
+                    zones_used.add(zone)
+                    chosen.append(server_id)
+                step += 1
+        step = 0
+        while len(chosen) < n and step < num_positions:
+            server_id = self.server_table[self._owners[(idx + step) % num_positions]]
+            if server_id not in chosen:
+                chosen.append(server_id)
+            step += 1
+        return chosen
+
+    def _capacity(self, total):
+        """
+        Keys one unit of weight may hold in bounded-load mode when `total` keys are placed.
+        A server is full once its load reaches capacity * weight (for integer loads this is the same as
+        reaching ceil(capacity * weight)).
+        """
+        if self.load_factor is None:
+            return math.inf
+        return self.load_factor * total / self._total_weight
+
+    def _walk(self, idx, loads, capacity):
+        """Return the slot of the first server clockwise from position idx whose load is below its limit."""
+        num_positions = len(self._positions)
+        weights = self._weights
+        for step in range(num_positions):
+            slot = int(self._owners[(idx + step) % num_positions])
+            if loads[slot] < capacity * weights[slot]:
+                return slot
+        # Unreachable while load_factor >= 1: the limits of all servers add up to at least the total keys.
+        raise RuntimeError("No server below capacity")
+
+    def assign(self, key):
+        """
+        Place a key on a server and record the assignment (bounded-load mode for live traffic).
+        The key goes to its usual server unless that server is full, in which case it walks
+        clockwise to the first server with spare capacity. Assigning a key twice returns its existing server.
+        """
+        if key in self._assignments:
+            return self.server_table[self._assignments[key]]
+        if len(self._positions) == 0:
+            return None
+        idx = self._bisect(key) % len(self._positions)
+        slot = self._walk(idx, self._loads, self._capacity(len(self._assignments) + 1))
+        self._assignments[key] = slot
+        self._slot_keys[slot].add(key)
+        self._loads[slot] += 1
+        return self.server_table[slot]
+
+    def release(self, key):
+        """Forget a key placed with assign, freeing capacity on its server. Returns False if it was not assigned."""
+        slot = self._assignments.pop(key, None)
+        if slot is None:
+            return False
+        self._slot_keys[slot].discard(key)
+        self._loads[slot] -= 1
+        return True
+
+    def get_assignment(self, key):
+        """Return the server a key was placed on with assign, or None."""
+        slot = self._assignments.get(key)
+        return None if slot is None else self.server_table[slot]
+
+    def server_loads(self):
+        """Return a mapping of server_id -> number of keys currently placed on it with assign."""
+        return {s: self._loads[slot] for s, slot in self._server_slots.items()}
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+
+from ConsistentHashRing import ConsistentHashRing
+from hashers import HASHERS
+
+
+def build_ring(hasher, num_shards, num_replicas):
+    ring = ConsistentHashRing(num_replicas=num_replicas, hasher=hasher)
+    ring.add_servers(f"shard-{i}" for i in range(num_shards))
+    return ring
+
+
+def benchmark_hasher(hasher, keys, num_shards, num_replicas, single_lookups):
+    """Measure lookup cost and load balance of one hasher. Returns a dict of results."""
+    ring = build_ring(hasher, num_shards, num_replicas)
+
+    start = time.perf_counter()
+    for key in keys[:single_lookups]:
+        ring.get_server(key)
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hashes = ring.hash_keys(keys)
+    hash_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices = ring.lookup_hashes(hashes)
+    search_elapsed = time.perf_counter() - start
+
+    loads = np.bincount(indices, minlength=len(ring.server_table))
+    return {
+        'hasher': hasher,
+        'single_lookups_per_sec': single_lookups / single_elapsed,
+        'batch_hash_per_sec': len(keys) / hash_elapsed,
+        'batch_search_per_sec': len(keys) / search_elapsed,
+        'batch_total_per_sec': len(keys) / (hash_elapsed + search_elapsed),
+        'load_std_dev': float(np.std(loads)),
+        'load_max_over_mean': float(loads.max() / loads.mean()),
+    }
+
+
+def print_results(results):
+    header = f"{'hasher':<10}{'get_server/s':>14}{'hash/s':>14}{'search/s':>14}{'batch/s':>14}{'std dev':>10}{'max/mean':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['hasher']:<10}{r['single_lookups_per_sec']:>14,.0f}{r['batch_hash_per_sec']:>14,.0f}"
+              f"{r['batch_search_per_sec']:>14,.0f}{r['batch_total_per_sec']:>14,.0f}"
+              f"{r['load_std_dev']:>10.2f}{r['load_max_over_mean']:>10.2f}")
+
+
+if __name__ == "__main__":
+    NUM_SHARDS = 1000
+    NUM_REPLICAS = 100  # Virtual nodes per shard
+    NUM_KEYS = 1_000_000
+    SINGLE_LOOKUPS = 100_000
+
+    keys = [f"key-{i}" for i in range(NUM_KEYS)]
+    print(f"--- Hasher comparison: {NUM_SHARDS} shards x {NUM_REPLICAS} vnodes, {NUM_KEYS} keys ---")
+    results = [benchmark_hasher(name, keys, NUM_SHARDS, NUM_REPLICAS, SINGLE_LOOKUPS) for name in HASHERS]
+    print_results(results)
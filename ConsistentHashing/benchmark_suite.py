@@ -0,0 +1,248 @@
+import argparse
+import bisect
+import itertools
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from ConsistentHashRing import ConsistentHashRing
+
+# metric name -> True if higher is better
+METRICS = {
+    'build_seconds': False,
+    'single_lookups_per_sec': True,
+    'single_lookup_vs_bisect': True,
+    'batch_lookups_per_sec': True,
+    'add_server_ms': False,
+    'remove_server_ms': False,
+    'bytes_per_vnode': False,
+    'load_std_dev': False,
+    'load_max_over_mean': False,
+    'keys_moved_on_add_pct': False,
+    'keys_moved_on_remove_pct': False,
+}
+
+
+def owners(ring, keys):
+    return np.array(ring.server_table, dtype=object)[ring.get_servers(keys)]
+
+
+def median_ms(fn, repeats):
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def best_rates(lookups, keys, repeats=7):
+    """
+    Lookups per second of each function in lookups, taking the fastest of several passes over keys.
+    The passes are interleaved so background load disturbs every function alike.
+    """
+    best = [math.inf] * len(lookups)
+    for _ in range(repeats):
+        for i, lookup in enumerate(lookups):
+            start = time.perf_counter()
+            for key in keys:
+                lookup(key)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return [len(keys) / seconds for seconds in best]
+
+
+def ring_bytes(hasher, num_replicas, shards):
+    """Memory a freshly built ring keeps allocated (arrays, server table, bookkeeping), measured with tracemalloc."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        ring = ConsistentHashRing(num_replicas=num_replicas, hasher=hasher)
+        ring.add_servers(shards)
+        return tracemalloc.get_traced_memory()[0] - before, len(ring._positions)
+    finally:
+        tracemalloc.stop()
+
+
+def run_config(hasher, num_shards, num_replicas, num_keys, single_lookups=20_000, repeats=25):
+    """Benchmark one (shards, vnodes, keys) configuration. Returns a dict of metrics."""
+    keys = [f"key-{i}" for i in range(num_keys)]
+    shards = [f"shard-{i}" for i in range(num_shards)]
+
+    ring = ConsistentHashRing(num_replicas=num_replicas, hasher=hasher)
+    start = time.perf_counter()
+    ring.add_servers(shards)
+    build_seconds = time.perf_counter() - start
+
+    sample = keys[:single_lookups]
+    # The original ring's single-key path on the same positions: hash, bisect a list of ints, dict lookup.
+    positions, position_owners, hash_key = ring.sorted_keys, ring.ring, ring.hasher.hash
+
+    def bisect_lookup(key):
+        return position_owners[positions[bisect.bisect(positions, hash_key(key)) % len(positions)]]
+
+    single_rate, bisect_rate = best_rates([ring.get_server, bisect_lookup], sample)
+
+    start = time.perf_counter()
+    indices = ring.get_servers(keys)
+    batch_rate = num_keys / (time.perf_counter() - start)
+
+    loads = np.bincount(indices, minlength=len(ring.server_table))
+    # Measured on a separate build so tracing does not slow down the timed one.
+    retained_bytes, num_vnodes = ring_bytes(hasher, num_replicas, shards)
+    bytes_per_vnode = retained_bytes / num_vnodes
+
+    before = owners(ring, keys)
+    ring.add_server("shard-new")
+    after_add = owners(ring, keys)
+    ring.remove_server(shards[0])
+    after_remove = owners(ring, keys)
+
+    # Latency of single membership changes: add a fresh server, then remove it again.
+    add_ms = median_ms(lambda i: ring.add_server(f"bench-{i}"), repeats)
+    remove_ms = median_ms(lambda i: ring.remove_server(f"bench-{i}"), repeats)
+
+    return {
+        'hasher': hasher,
+        'shards': num_shards,
+        'vnodes': num_replicas,
+        'keys': num_keys,
+        'build_seconds': build_seconds,
+        'single_lookups_per_sec': single_rate,
+        'single_lookup_vs_bisect': single_rate / bisect_rate,
+        'batch_lookups_per_sec': batch_rate,
+        'add_server_ms': add_ms,
+        'remove_server_ms': remove_ms,
+        'bytes_per_vnode': bytes_per_vnode,
+        'load_std_dev': float(np.std(loads)),
+        'load_max_over_mean': float(loads.max() / loads.mean()),
+        'keys_moved_on_add_pct': 100 * float(np.mean(before != after_add)),
+        'keys_moved_on_remove_pct': 100 * float(np.mean(after_add != after_remove)),
+    }
+
+
+def config_id(result):
+    return f"{result['hasher']}/shards={result['shards']}/vnodes={result['vnodes']}/keys={result['keys']}"
+
+
+def missing_from_baseline(results, baseline):
+    """Config ids of results that have no matching entry in the baseline run."""
+    stored = {config_id(r) for r in baseline['results']}
+    return [config_id(r) for r in results if config_id(r) not in stored]
+
+
+def find_regressions(results, baseline, threshold):
+    """Compare results against a baseline run. Returns a list of human readable regression messages."""
+    previous = {config_id(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(config_id(result))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            new_value, old_value = result[metric], old.get(metric)
+            if not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{config_id(result)} {metric}: {old_value:.4g} -> {new_value:.4g} ({change:+.1%})")
+    return regressions
+
+
+def slow_single_lookups(results, min_ratio):
+    """Configs whose get_server runs below min_ratio times the speed of the original bisect lookup."""
+    return [f"{config_id(r)} single_lookup_vs_bisect: {r['single_lookup_vs_bisect']:.2f} (minimum {min_ratio:.2f})"
+            for r in results if r['single_lookup_vs_bisect'] < min_ratio]
+
+
+def print_results(results):
+    header = f"{'config':<48}{'lookup/s':>12}{'vs bisect':>10}{'batch/s':>12}{'add ms':>9}{'rm ms':>9}{'B/vnode':>9}{'std dev':>9}{'moved %':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{config_id(r):<48}{r['single_lookups_per_sec']:>12,.0f}{r['single_lookup_vs_bisect']:>10.2f}"
+              f"{r['batch_lookups_per_sec']:>12,.0f}"
+              f"{r['add_server_ms']:>9.2f}{r['remove_server_ms']:>9.2f}{r['bytes_per_vnode']:>9.1f}"
+              f"{r['load_std_dev']:>9.2f}{r['keys_moved_on_add_pct']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark and regression suite for ConsistentHashRing")
+    parser.add_argument('--hasher', default='md5', help='Hasher to benchmark (default: md5)')
+    parser.add_argument('--shards', type=int, nargs='+', default=[100, 1000], help='Shard counts to sweep')
+    parser.add_argument('--vnodes', type=int, nargs='+', default=[10, 100], help='Virtual node counts to sweep')
+    parser.add_argument('--keys', type=int, nargs='+', default=[100_000], help='Key counts to sweep')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Fail if any metric is worse than the baseline by more than this fraction (default: 0.25)')
+    parser.add_argument('--min-single-ratio', type=float, default=0.8,
+                        help='Fail if get_server is slower than this fraction of the original bisect lookup (default: 0.8)')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline')
+    args = parser.parse_args()
+
+    results = [run_config(args.hasher, shards, vnodes, keys)
+               for shards, vnodes, keys in itertools.product(args.shards, args.vnodes, args.keys)]
+    print_results(results)
+
+    run = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nWrote results to {args.output}")
+
+    # Checked on every run: this ratio needs no baseline, so a slow single-key path cannot become the baseline.
+    slow = slow_single_lookups(results, args.min_single_ratio)
+    if slow:
+        print(f"\nget_server is slower than {args.min_single_ratio:.0%} of the original bisect lookup:")
+        for message in slow:
+            print(f"  {message}")
+        return 1
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Stored baseline in {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        # Without a baseline nothing was checked, which must not look like a passing run.
+        print(f"No baseline at {args.baseline}; run once with --update-baseline on this machine to store one.")
+        return 2
+
+    # A config without a baseline entry was not checked, just like a run without any baseline.
+    missing = missing_from_baseline(results, baseline)
+    if missing:
+        print(f"\n{len(missing)} config(s) have no entry in {args.baseline}:")
+        for name in missing:
+            print(f"  {name}")
+        print("Run the same sweep as the baseline, or store a new one with --update-baseline.")
+        return 2
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} compared with {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
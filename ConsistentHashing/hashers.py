@@ -0,0 +1,147 @@
+import hashlib
+
+import numpy as np
+
+MASK64 = (1 << 64) - 1
+FMIX_C1 = 0xff51afd7ed558ccd
+FMIX_C2 = 0xc4ceb9fe1a85ec53
+
+
+def fmix64(h):
+    """MurmurHash3 64-bit finalizer. Works on Python ints and on uint64 NumPy arrays."""
+    if isinstance(h, np.ndarray):
+        shift = np.uint64(33)
+        h = h ^ (h >> shift)
+        h = h * np.uint64(FMIX_C1)
+        h = h ^ (h >> shift)
+        h = h * np.uint64(FMIX_C2)
+        return h ^ (h >> shift)
+    h ^= h >> 33
+    h = (h * FMIX_C1) & MASK64
+    h ^= h >> 33
+    h = (h * FMIX_C2) & MASK64
+    return h ^ (h >> 33)
+
+
+class Md5Hasher:
+    """
+    Legacy hasher: the full 128-bit MD5 digest, exactly as the original ConsistentHashRing used it.
+    Keep this one to reproduce existing placements. Batches of hashes are 16-byte big-endian
+    strings ('S16'), which sort in the same order as the 128-bit integers.
+    """
+    name = 'md5'
+    bits = 128
+    dtype = np.dtype('S16')
+
+    def hash(self, key):
+        return int(hashlib.md5(str(key).encode('utf-8')).hexdigest(), 16)
+
+    def hash_many(self, keys):
+        md5 = hashlib.md5
+        data = b''.join([md5(str(key).encode('utf-8')).digest() for key in keys])
+        return np.frombuffer(data, dtype=self.dtype)
+
+    def to_array(self, values):
+        """Convert a list of hash values (ints) into this hasher's array representation."""
+        return np.frombuffer(b''.join([v.to_bytes(16, 'big') for v in values]), dtype=self.dtype)
+
+    def to_scalar(self, value):
+        """Convert one hash value (int) into a NumPy scalar comparable with this hasher's arrays."""
+        return np.bytes_(value.to_bytes(16, 'big'))
+
+    def to_ints(self, array):
+        """Convert an array of hashes back into a list of ints."""
+        data = array.tobytes()
+        return [int.from_bytes(data[i:i + 16], 'big') for i in range(0, len(data), 16)]
+
+
+class _Hasher64:
+    """Base class for hashers that produce fixed-width unsigned 64-bit positions."""
+    bits = 64
+    dtype = np.dtype(np.uint64)
+
+    def to_array(self, values):
+        return np.array(values, dtype=np.uint64)
+
+    def to_scalar(self, value):
+        return np.uint64(value)
+
+    def to_ints(self, array):
+        return array.tolist()
+
+
+class Md5Truncated64Hasher(_Hasher64):
+    """MD5 truncated to its first 64 bits (big-endian): same distribution as md5, cheaper positions."""
+    name = 'md5_64'
+
+    def hash(self, key):
+        return int.from_bytes(hashlib.md5(str(key).encode('utf-8')).digest()[:8], 'big')
+
+    def hash_many(self, keys):
+        md5 = hashlib.md5
+        data = b''.join([md5(str(key).encode('utf-8')).digest()[:8] for key in keys])
+        return np.frombuffer(data, dtype='>u8').astype(np.uint64)
+
+
+class Blake2bHasher(_Hasher64):
+    """BLAKE2b with an 8-byte digest: faster than MD5 and produces a 64-bit position directly."""
+    name = 'blake2b'
+
+    def hash(self, key):
+        return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def hash_many(self, keys):
+        blake2b = hashlib.blake2b
+        data = b''.join([blake2b(str(key).encode('utf-8'), digest_size=8).digest() for key in keys])
+        return np.frombuffer(data, dtype='>u8').astype(np.uint64)
+
+
+class Fnv1aHasher(_Hasher64):
+    """
+    64-bit FNV-1a. Not cryptographic, but the batch form runs entirely in NumPy:
+    keys are packed into a (num_keys, max_len) byte matrix and hashed one column at a time.
+
+    Plain FNV-1a mixes its high bits poorly for short, similar keys such as "shard-12#3",
+    which clusters them on the ring. The result is passed through the MurmurHash3 fmix64
+    finalizer so that every output bit depends on every input bit.
+    """
+    name = 'fnv1a'
+    OFFSET_BASIS = 0xcbf29ce484222325
+    PRIME = 0x100000001b3
+
+    def hash(self, key):
+        h = self.OFFSET_BASIS
+        for byte in str(key).encode('utf-8'):
+            h = ((h ^ byte) * self.PRIME) & MASK64
+        return fmix64(h)
+
+    def hash_many(self, keys):
+        encoded = [str(key).encode('utf-8') for key in keys]
+        h = np.full(len(encoded), self.OFFSET_BASIS, dtype=np.uint64)
+        if not encoded:
+            return h
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        width = int(lengths.max())
+        if width == 0:
+            return fmix64(h)
+        matrix = np.frombuffer(b''.join([e.ljust(width, b'\0') for e in encoded]), dtype=np.uint8)
+        matrix = matrix.reshape(len(encoded), width)
+        prime = np.uint64(self.PRIME)
+        for col in range(width):
+            active = lengths > col
+            # uint64 multiplication wraps modulo 2**64, which is exactly what FNV needs.
+            mixed = (h ^ matrix[:, col].astype(np.uint64)) * prime
+            h = np.where(active, mixed, h)
+        return fmix64(h)
+
+
+HASHERS = {cls.name: cls for cls in (Md5Hasher, Md5Truncated64Hasher, Blake2bHasher, Fnv1aHasher)}
+
+
+def get_hasher(hasher):
+    """Return a hasher instance given its name (see HASHERS) or an already constructed hasher."""
+    if isinstance(hasher, str):
+        if hasher not in HASHERS:
+            raise ValueError(f"Unknown hasher '{hasher}'. Choose one of: {', '.join(HASHERS)}")
+        return HASHERS[hasher]()
+    return hasher
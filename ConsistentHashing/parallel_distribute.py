@@ -0,0 +1,92 @@
+import os
+import time
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from ConsistentHashRing import ConsistentHashRing
+
+# Per-worker state, set once by _init_worker.
+_worker_ring = None
+_worker_shm = None
+
+
+def _init_worker(shm_name, hasher_name, dtype, num_positions):
+    """Attach to the shared ring arrays once per worker process and build a read-only ring around them."""
+    global _worker_ring, _worker_shm
+    # Pool workers share the parent's resource tracker, so the parent's unlink() cleans up for everyone.
+    _worker_shm = SharedMemory(name=shm_name)
+    dtype = np.dtype(dtype)
+    ring = ConsistentHashRing(hasher=hasher_name)
+    ring._positions = np.frombuffer(_worker_shm.buf, dtype=dtype, count=num_positions)
+    ring._owners = np.frombuffer(_worker_shm.buf, dtype=np.int32, count=num_positions,
+                                 offset=num_positions * dtype.itemsize)
+    _worker_ring = ring
+
+
+def _route_chunk(chunk):
+    """Route one chunk of keys; returns the compact int32 array of owner slots."""
+    return _worker_ring.lookup_hashes(_worker_ring.hasher.hash_many(chunk))
+
+
+def distribute_keys_parallel(ring, keys, processes=None, chunk_size=100_000):
+    """
+    Multi-process version of ring.distribute_keys for offline resharding jobs.
+
+    The ring's position and owner arrays are published once in a multiprocessing.shared_memory segment.
+    Each worker attaches to it at start-up, hashes and routes chunks of keys, and sends back an int32 array
+    of owner slots instead of pickled lists of strings. The parent then groups key indices by server.
+
+    Returns a mapping of server_id -> NumPy array of indices into `keys`.
+    Bounded-load mode is not applied; this is plain hash routing, like get_servers.
+    """
+    keys = list(keys)
+    mapping = {s: np.empty(0, dtype=np.int64) for s in ring.servers}
+    if not keys or not ring.servers:
+        return mapping
+    processes = processes or os.cpu_count()
+
+    positions = np.ascontiguousarray(ring._positions)
+    owners = np.ascontiguousarray(ring._owners, dtype=np.int32)
+    shm = SharedMemory(create=True, size=positions.nbytes + owners.nbytes)
+    try:
+        np.frombuffer(shm.buf, dtype=positions.dtype, count=len(positions))[:] = positions
+        np.frombuffer(shm.buf, dtype=np.int32, count=len(owners), offset=positions.nbytes)[:] = owners
+        chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+        init_args = (shm.name, ring.hasher.name, positions.dtype.str, len(positions))
+        with Pool(processes, initializer=_init_worker, initargs=init_args) as pool:
+            slots = np.concatenate(pool.map(_route_chunk, chunks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Group key indices by slot: a stable sort keeps each server's indices in key order.
+    order = np.argsort(slots, kind='stable')
+    counts = np.bincount(slots, minlength=len(ring.server_table))
+    for slot, indices in enumerate(np.split(order, np.cumsum(counts)[:-1])):
+        if counts[slot]:
+            mapping[ring.server_table[slot]] = indices
+    return mapping
+
+
+if __name__ == "__main__":
+    NUM_SHARDS = 1000
+    NUM_REPLICAS = 100
+    NUM_KEYS = 2_000_000
+
+    ring = ConsistentHashRing(num_replicas=NUM_REPLICAS, hasher='blake2b')
+    ring.add_servers(f"shard-{i}" for i in range(NUM_SHARDS))
+    keys = [f"key-{i}" for i in range(NUM_KEYS)]
+
+    start = time.perf_counter()
+    ring.get_servers(keys)
+    single = time.perf_counter() - start
+    print(f"Single process: {NUM_KEYS / single:,.0f} keys/sec")
+
+    process_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    for processes in process_counts:
+        start = time.perf_counter()
+        distribute_keys_parallel(ring, keys, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(f"{processes} processes: {NUM_KEYS / elapsed:,.0f} keys/sec ({single / elapsed:.2f}x single process)")
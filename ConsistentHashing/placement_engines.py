@@ -0,0 +1,224 @@
+import numpy as np
+
+from ConsistentHashRing import ConsistentHashRing
+from hashers import fmix64, get_hasher
+
+
+class _PlacementEngine:
+    """
+    Shared plumbing for the engines below. Every engine exposes the same interface as
+    ConsistentHashRing: add_server(s), remove_server(s), get_server, get_servers (indices into
+    server_table) and distribute_keys. Subclasses implement add_servers, remove_servers and lookup_hashes.
+    """
+    def __init__(self, hasher='blake2b'):
+        self.hasher = get_hasher(hasher)
+        if self.hasher.bits != 64:
+            raise ValueError(f"{type(self).__name__} needs a 64-bit hasher, got '{self.hasher.name}'")
+        self.servers = set()
+        self.server_table = []  # index -> server id
+
+    def _hash(self, key):
+        return self.hasher.hash(key)
+
+    def _hash_many(self, keys):
+        return self.hasher.hash_many(keys)
+
+    def add_server(self, server_id):
+        """Add a server to the placement."""
+        self.add_servers([server_id])
+
+    def remove_server(self, server_id):
+        """Remove a server from the placement."""
+        self.remove_servers([server_id])
+
+    def hash_keys(self, keys):
+        """Hash a batch of keys once so the result can be routed repeatedly with lookup_hashes."""
+        return self._hash_many(keys)
+
+    def get_server(self, key):
+        """Get the server responsible for a given key."""
+        if not self.server_table:
+            return None
+        return self.server_table[int(self.lookup_hashes(np.array([self._hash(key)], dtype=np.uint64))[0])]
+
+    def get_servers(self, keys):
+        """Return a NumPy array holding, for each key, the index of its server in server_table."""
+        if not self.server_table:
+            return np.empty(0, dtype=np.int32)
+        return self.lookup_hashes(self._hash_many(keys))
+
+    def distribute_keys(self, keys):
+        """Return a mapping of server_id -> list of keys assigned to it."""
+        mapping = {s: [] for s in self.servers}
+        if not self.server_table:
+            return mapping
+        keys = list(keys)
+        server_table = self.server_table
+        for key, idx in zip(keys, self.get_servers(keys).tolist()):
+            mapping[server_table[idx]].append(key)
+        return mapping
+
+
+class JumpHashEngine(_PlacementEngine):
+    """
+    Jump consistent hash (Lamping & Veach). No ring and no virtual nodes: O(1) memory per server
+    and an O(log n) loop per key, with near-perfect balance.
+
+    Trade-off: buckets must be numbered 0..n-1, so servers can only be appended. Removing a server
+    that is not the last one moves the last server into its bucket, which remaps that server's keys
+    as well as the removed server's keys.
+    """
+    def add_servers(self, server_ids):
+        for server_id in dict.fromkeys(server_ids):
+            if server_id not in self.servers:
+                self.servers.add(server_id)
+                self.server_table.append(server_id)
+
+    def remove_servers(self, server_ids):
+        for server_id in dict.fromkeys(server_ids):
+            if server_id not in self.servers:
+                continue
+            self.servers.discard(server_id)
+            idx = self.server_table.index(server_id)
+            last = self.server_table.pop()
+            if idx < len(self.server_table):
+                self.server_table[idx] = last
+
+    def lookup_hashes(self, hashes):
+        num_buckets = len(self.server_table)
+        if num_buckets == 0:
+            return np.empty(0, dtype=np.int32)
+        key = np.array(hashes, dtype=np.uint64)
+        bucket = np.full(len(key), -1, dtype=np.int64)
+        candidate = np.zeros(len(key), dtype=np.int64)
+        active = np.arange(len(key))
+        multiplier, one, shift = np.uint64(2862933555777941917), np.uint64(1), np.uint64(33)
+        # Every key runs the same loop; keep iterating only the keys whose next jump is still in range.
+        while len(active):
+            bucket[active] = candidate[active]
+            k = key[active] * multiplier + one
+            key[active] = k
+            candidate[active] = ((bucket[active] + 1) * (float(1 << 31) / ((k >> shift) + one).astype(np.float64))).astype(np.int64)
+            active = active[candidate[active] < num_buckets]
+        return bucket.astype(np.int32)
+
+
+class RendezvousEngine(_PlacementEngine):
+    """
+    Rendezvous (highest random weight) hashing. Each key goes to the server with the highest
+    score fmix64(key_hash ^ server_seed). No virtual nodes are needed and removing a server only
+    moves that server's keys, but every lookup scores all n servers: O(n) per key.
+    """
+    def __init__(self, hasher='blake2b', chunk_cells=1 << 22):
+        """
+        chunk_cells: Upper bound on the size of the (keys x servers) score matrix built per batch step.
+        """
+        super().__init__(hasher)
+        self.chunk_cells = chunk_cells
+        self._seeds = np.empty(0, dtype=np.uint64)
+
+    def add_servers(self, server_ids):
+        new = [s for s in dict.fromkeys(server_ids) if s not in self.servers]
+        if not new:
+            return
+        self.servers.update(new)
+        self.server_table.extend(new)
+        self._seeds = np.concatenate([self._seeds, self._hash_many(new)])
+
+    def remove_servers(self, server_ids):
+        gone = set(server_ids) & self.servers
+        if not gone:
+            return
+        self.servers -= gone
+        keep = [i for i, s in enumerate(self.server_table) if s not in gone]
+        self.server_table = [self.server_table[i] for i in keep]
+        self._seeds = self._seeds[keep]
+
+    def lookup_hashes(self, hashes):
+        if not self.server_table:
+            return np.empty(0, dtype=np.int32)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        result = np.empty(len(hashes), dtype=np.int32)
+        step = max(1, self.chunk_cells // len(self._seeds))
+        for start in range(0, len(hashes), step):
+            scores = fmix64(hashes[start:start + step, None] ^ self._seeds[None, :])
+            result[start:start + step] = np.argmax(scores, axis=1)
+        return result
+
+
+class MaglevEngine(_PlacementEngine):
+    """
+    Maglev hashing (Google's load balancer). Each server fills slots of a prime-sized lookup table
+    following its own permutation, taking turns so every server gets an almost equal share.
+    Lookups are a single table index, O(1), but the table (table_size entries) is rebuilt on every
+    membership change and a change moves slightly more keys than the theoretical minimum.
+    """
+    def __init__(self, hasher='blake2b', table_size=65537):
+        """
+        table_size: Number of lookup table slots. Must be prime and much larger than the number of servers.
+        """
+        super().__init__(hasher)
+        self.table_size = table_size
+        self._table = None  # rebuilt lazily after membership changes
+
+    def add_servers(self, server_ids):
+        new = [s for s in dict.fromkeys(server_ids) if s not in self.servers]
+        if len(self.server_table) + len(new) > self.table_size:
+            raise ValueError(f"Maglev table of size {self.table_size} cannot hold more servers than slots")
+        self.servers.update(new)
+        self.server_table.extend(new)
+        self._table = None
+
+    def remove_servers(self, server_ids):
+        gone = set(server_ids) & self.servers
+        if not gone:
+            return
+        self.servers -= gone
+        self.server_table = [s for s in self.server_table if s not in gone]
+        self._table = None
+
+    def _build_table(self):
+        m = self.table_size
+        offsets = [h % m for h in self._hash_many([f"{s}#offset" for s in self.server_table]).tolist()]
+        skips = [h % (m - 1) + 1 for h in self._hash_many([f"{s}#skip" for s in self.server_table]).tolist()]
+        next_choice = [0] * len(self.server_table)
+        table = [-1] * m
+        filled = 0
+        while filled < m:
+            for i in range(len(self.server_table)):
+                c = (offsets[i] + next_choice[i] * skips[i]) % m
+                while table[c] >= 0:
+                    next_choice[i] += 1
+                    c = (offsets[i] + next_choice[i] * skips[i]) % m
+                table[c] = i
+                next_choice[i] += 1
+                filled += 1
+                if filled == m:
+                    break
+        self._table = np.array(table, dtype=np.int32)
+
+    def lookup_hashes(self, hashes):
+        if not self.server_table:
+            return np.empty(0, dtype=np.int32)
+        if self._table is None:
+            self._build_table()
+        return self._table[np.asarray(hashes, dtype=np.uint64) % np.uint64(self.table_size)]
+
+
+ENGINES = {
+    'ring': ConsistentHashRing,
+    'jump': JumpHashEngine,
+    'rendezvous': RendezvousEngine,
+    'maglev': MaglevEngine,
+}
+
+
+def make_placement(engine='ring', **options):
+    """
+    Build a placement engine by name. All engines share the ConsistentHashRing interface, so callers
+    can switch engines per workload: 'ring' (virtual-node ring), 'jump', 'rendezvous' or 'maglev'.
+    Extra keyword arguments go to the engine's constructor (e.g. num_replicas for 'ring').
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown placement engine '{engine}'. Choose one of: {', '.join(ENGINES)}")
+    return ENGINES[engine](**options)
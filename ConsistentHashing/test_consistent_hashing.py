@@ -1,7 +1,10 @@
 import matplotlib
 matplotlib.use('Agg')
 from ConsistentHashRing import ConsistentHashRing
+from placement_engines import ENGINES, make_placement
+from rebalance_planner import moved_fraction
 import random
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -27,6 +30,50 @@ def plot_distribution(mapping, title):
     print(f"Saved distribution plot to {filename}")
     print(f"Distribution Stats -> Mean: {mean_load:.2f}, Std Dev: {std_dev:.2f}, Min: {np.min(shard_loads)}, Max: {np.max(shard_loads)}\n")
 
+def report_load_per_weight(mapping, ring):
+    """Prints keys per unit of weight for every distinct server weight in the ring."""
+    by_weight = {}
+    for shard, shard_keys in mapping.items():
+        weight = ring.get_weight(shard)
+        by_weight.setdefault(weight, []).append(len(shard_keys) / weight)
+    for weight, loads in sorted(by_weight.items()):
+        print(f"Weight {weight}: {len(loads)} shards, keys per unit weight -> "
+              f"Mean: {np.mean(loads):.2f}, Std Dev: {np.std(loads):.2f}, Min: {np.min(loads):.2f}, Max: {np.max(loads):.2f}")
+    print()
+
+def owners_of(placement, keys):
+    """Return an array with the server id owning each key."""
+    return np.array(placement.server_table, dtype=object)[placement.get_servers(keys)]
+
+def compare_engines(keys, num_shards, num_replicas, num_changed):
+    """Report load std-dev, lookup speed and keys moved for every placement engine."""
+    shards = [f"shard-{i}" for i in range(num_shards)]
+    removed = random.sample(shards, num_changed)
+    added = [f"shard-{i}" for i in range(num_shards, num_shards + num_changed)]
+
+    print(f"{'engine':<12}{'lookups/s':>12}{'std dev':>10}{'moved (remove)':>16}{'moved (add)':>14}")
+    for name in ENGINES:
+        options = {'num_replicas': num_replicas} if name == 'ring' else {}
+        placement = make_placement(name, **options)
+        placement.add_servers(shards)
+
+        # The first lookup also builds any lazy tables (e.g. Maglev), so time the second one.
+        loads = np.bincount(placement.get_servers(keys), minlength=len(placement.server_table))
+        start = time.perf_counter()
+        initial = owners_of(placement, keys)
+        elapsed = time.perf_counter() - start
+
+        placement.remove_servers(removed)
+        after_removal = owners_of(placement, keys)
+        placement.add_servers(added)
+        after_add = owners_of(placement, keys)
+
+        moved_on_removal = np.mean(initial != after_removal)
+        moved_on_add = np.mean(after_removal != after_add)
+        print(f"{name:<12}{len(keys) / elapsed:>12,.0f}{np.std(loads):>10.2f}"
+              f"{moved_on_removal:>16.2%}{moved_on_add:>14.2%}")
+    print()
+
 if __name__ == "__main__":
     NUM_SHARDS = 1000
     NUM_REPLICAS = 3 # Virtual nodes per shard
@@ -34,8 +81,7 @@ if __name__ == "__main__":
 
     # --- Initial State ---
     ring = ConsistentHashRing(num_replicas=NUM_REPLICAS)
-    for i in range(NUM_SHARDS):
-        ring.add_server(f"shard-{i}")
+    ring.add_servers(f"shard-{i}" for i in range(NUM_SHARDS))
 
     keys = [f"key-{i}" for i in range(NUM_KEYS)]
     initial_mapping = ring.distribute_keys(keys)
@@ -44,21 +90,36 @@ if __name__ == "__main__":
 
     # --- After Removing Shards ---
     shards_to_remove = random.sample(list(ring.servers), 50)
-    for shard_id in shards_to_remove:
-        ring.remove_server(shard_id)
+    removal_plan = ring.plan_remove_servers(shards_to_remove)
+    ring.remove_servers(shards_to_remove)
     
     mapping_after_removal = ring.distribute_keys(keys)
     print(f"--- Distribution After Removing {len(shards_to_remove)} Shards ---")
     plot_distribution(mapping_after_removal, f"Distribution After Removing {len(shards_to_remove)} Shards")
 
     # --- After Adding New Shards ---
-    for i in range(NUM_SHARDS, NUM_SHARDS + 50):
-        ring.add_server(f"shard-{i}")
+    add_plan = ring.plan_add_servers(f"shard-{i}" for i in range(NUM_SHARDS, NUM_SHARDS + 50))
+    ring.add_servers(f"shard-{i}" for i in range(NUM_SHARDS, NUM_SHARDS + 50))
 
     mapping_after_add = ring.distribute_keys(keys)
     print(f"--- Distribution After Adding 50 New Shards ---")
     plot_distribution(mapping_after_add, f"Distribution After Adding 50 New Shards")
 
+    # --- Bounded Loads ---
+    LOAD_FACTOR = 1.25
+    bounded_ring = ConsistentHashRing(num_replicas=NUM_REPLICAS, load_factor=LOAD_FACTOR)
+    bounded_ring.add_servers(f"shard-{i}" for i in range(NUM_SHARDS))
+    bounded_mapping = bounded_ring.distribute_keys(keys)
+    print(f"--- Bounded-Load Distribution (load factor {LOAD_FACTOR}) ---")
+    plot_distribution(bounded_mapping, f"Bounded Load Distribution of {NUM_KEYS} Keys Across {NUM_SHARDS} Shards")
+
+    # --- Weighted Servers (mixed 8-core and 64-core fleet) ---
+    weighted_ring = ConsistentHashRing(num_replicas=NUM_REPLICAS)
+    weighted_ring.add_servers((f"shard-{i}" for i in range(NUM_SHARDS)),
+                              weights={f"shard-{i}": 8 if i % 5 == 0 else 1 for i in range(NUM_SHARDS)})
+    print("--- Weighted Distribution (every 5th shard has weight 8) ---")
+    report_load_per_weight(weighted_ring.distribute_keys(keys), weighted_ring)
+
     # --- Analyze Key Movement ---
     def get_key_to_shard_map(mapping):
         key_map = {}
@@ -76,4 +137,12 @@ if __name__ == "__main__":
 
     print("--- Key Movement Analysis ---")
     print(f"Keys moved after removing 50 shards: {moved_on_removal} / {NUM_KEYS} ({moved_on_removal/NUM_KEYS:.2%})")
-    print(f"Keys moved after adding 50 new shards: {moved_on_add} / {NUM_KEYS} ({moved_on_add/NUM_KEYS:.2%})")
\ No newline at end of file
+    print(f"Keys moved after adding 50 new shards: {moved_on_add} / {NUM_KEYS} ({moved_on_add/NUM_KEYS:.2%})")
+
+    # The rebalance planner predicts the same movement from the ring positions alone, without touching keys.
+    bits = ring.hasher.bits
+    print(f"Planned for removal: {len(removal_plan)} hash ranges covering {moved_fraction(removal_plan, bits):.2%} of the ring")
+    print(f"Planned for add: {len(add_plan)} hash ranges covering {moved_fraction(add_plan, bits):.2%} of the ring")
+
+    print(f"\n--- Placement Engine Comparison ({NUM_SHARDS} shards, {NUM_KEYS} keys, {len(shards_to_remove)} removed then 50 added) ---")
+    compare_engines(keys, NUM_SHARDS, NUM_REPLICAS, len(shards_to_remove))
@@ -0,0 +1,51 @@
+import bisect
+import hashlib
+import unittest
+
+from ConsistentHashRing import ConsistentHashRing
+from hashers import HASHERS, get_hasher
+
+KEYS = [f"key-{i}" for i in range(5000)] + ["", "ключ", "🔑", 42, 3.5]
+
+
+def baseline_owners(servers, num_replicas, keys):
+    """Placements computed the way the original ring did: 128-bit MD5 ints, bisect, wrap-around."""
+    def md5(key):
+        return int(hashlib.md5(str(key).encode('utf-8')).hexdigest(), 16)
+
+    ring = {md5(f"{server}#{i}"): server for server in servers for i in range(num_replicas)}
+    positions = sorted(ring)
+    return [ring[positions[bisect.bisect(positions, md5(key)) % len(positions)]] for key in keys]
+
+
+class TestHashers(unittest.TestCase):
+    """
+    Tests for the pluggable hashers: the legacy md5 mode keeps existing placements, and every
+    hasher gives the same values one key at a time and in batches.
+    """
+
+    def test_md5_reproduces_baseline_placements(self):
+        servers = [f"server-{i}" for i in range(12)]
+        ring = ConsistentHashRing(num_replicas=20)
+        ring.add_servers(servers[:6])
+        for server in servers[6:]:
+            ring.add_server(server)
+        expected = baseline_owners(servers, 20, KEYS)
+        self.assertEqual([ring.get_server(key) for key in KEYS], expected)
+        self.assertEqual([ring.server_table[slot] for slot in ring.get_servers(KEYS).tolist()], expected)
+
+        ring.remove_servers(servers[:3])
+        self.assertEqual([ring.get_server(key) for key in KEYS], baseline_owners(servers[3:], 20, KEYS))
+
+    def test_hash_and_hash_many_agree(self):
+        for name in HASHERS:
+            hasher = get_hasher(name)
+            batch = hasher.hash_many(KEYS)
+            self.assertEqual(batch.dtype, hasher.dtype, name)
+            self.assertEqual(hasher.to_ints(batch), [hasher.hash(key) for key in KEYS], name)
+            self.assertTrue(all(0 <= hasher.hash(key) < 2 ** hasher.bits for key in KEYS[:100]), name)
+            self.assertEqual(len(hasher.hash_many([])), 0, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from hashers import MASK64
+from placement_engines import ENGINES, JumpHashEngine, MaglevEngine, RendezvousEngine, make_placement
+
+KEYS = [f"key-{i}" for i in range(20_000)]
+SERVERS = [f"shard-{i}" for i in range(10)]
+
+
+def reference_jump(key, num_buckets):
+    """Jump consistent hash exactly as published by Lamping & Veach, one key at a time."""
+    bucket, candidate = -1, 0
+    while candidate < num_buckets:
+        bucket = candidate
+        key = (key * 2862933555777941917 + 1) & MASK64
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def owners(engine, keys):
+    return [engine.server_table[slot] for slot in engine.get_servers(keys).tolist()]
+
+
+class TestPlacementEngines(unittest.TestCase):
+    """
+    Tests for the jump, rendezvous and Maglev engines behind the ConsistentHashRing interface.
+    """
+
+    def test_jump_matches_reference(self):
+        engine = JumpHashEngine()
+        for num_buckets in (1, 2, 7, 10, 1000):
+            engine.add_servers(f"shard-{i}" for i in range(num_buckets))
+            hashes = engine.hash_keys(KEYS[:2000])
+            expected = [reference_jump(h, num_buckets) for h in hashes.tolist()]
+            self.assertEqual(engine.lookup_hashes(hashes).tolist(), expected)
+        self.assertEqual(engine.get_server(KEYS[0]), engine.server_table[reference_jump(engine._hash(KEYS[0]), 1000)])
+
+    def test_rendezvous_removal_moves_only_removed_keys(self):
+        engine = RendezvousEngine(chunk_cells=1000)  # several batch steps
+        engine.add_servers(SERVERS)
+        before = owners(engine, KEYS)
+        engine.remove_server("shard-3")
+        after = owners(engine, KEYS)
+        for old, new in zip(before, after):
+            if old == "shard-3":
+                self.assertNotEqual(new, "shard-3")
+            else:
+                self.assertEqual(new, old)
+        self.assertEqual([engine.get_server(key) for key in KEYS[:200]], after[:200])
+
+    def test_maglev_table_is_full_and_balanced(self):
+        engine = MaglevEngine(table_size=1009)
+        engine.add_servers(SERVERS)
+        engine.get_server(KEYS[0])
+        table = engine._table
+        self.assertEqual(len(table), 1009)
+        self.assertTrue((table >= 0).all())
+        counts = np.bincount(table, minlength=len(SERVERS))
+        self.assertEqual(len(counts), len(SERVERS))
+        self.assertLessEqual(counts.max() - counts.min(), 1)
+
+        engine.remove_server("shard-0")
+        engine.get_server(KEYS[0])
+        self.assertEqual(set(engine._table.tolist()), set(range(len(SERVERS) - 1)))
+        with self.assertRaises(ValueError):
+            MaglevEngine(table_size=5).add_servers(SERVERS)
+
+    def test_engines_share_the_ring_interface(self):
+        for name in ENGINES:
+            engine = make_placement(name)
+            self.assertIsNone(engine.get_server(KEYS[0]))
+            engine.add_servers(SERVERS)
+            mapping = engine.distribute_keys(KEYS)
+            self.assertEqual(set(mapping), set(SERVERS), name)
+            self.assertEqual(sum(len(keys) for keys in mapping.values()), len(KEYS), name)
+            self.assertEqual([engine.get_server(key) for key in KEYS[:200]], owners(engine, KEYS[:200]), name)
+        with self.assertRaises(ValueError):
+            make_placement('unknown')
+
+
+if __name__ == "__main__":
+    unittest.main()
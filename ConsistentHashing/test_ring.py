@@ -0,0 +1,241 @@
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ConsistentHashRing import ConsistentHashRing
+from parallel_distribute import distribute_keys_parallel
+from rebalance_planner import moved_fraction
+
+
+def make_ring(num_servers=10, num_replicas=50, hasher='blake2b', **options):
+    ring = ConsistentHashRing(num_replicas=num_replicas, hasher=hasher, **options)
+    ring.add_servers(f"shard-{i}" for i in range(num_servers))
+    return ring
+
+
+def owners(ring, keys):
+    return [ring.server_table[slot] for slot in ring.get_servers(keys).tolist()]
+
+
+KEYS = [f"key-{i}" for i in range(20_000)]
+
+
+class TestMembershipChanges(unittest.TestCase):
+    """
+    Tests for membership changes on the sorted position arrays and the single-key lookup path.
+    """
+
+    def test_single_key_lookups_follow_membership_changes(self):
+        for hasher in ('md5', 'md5_64', 'blake2b', 'fnv1a'):
+            ring = make_ring(hasher=hasher)
+            keys = KEYS[:2000]
+            self.assertEqual([ring.get_server(key) for key in keys], owners(ring, keys))
+            ring.add_servers(["new-1", "new-2"])
+            ring.remove_server("shard-0")
+            ring.set_weight("shard-1", 2)
+            self.assertEqual([ring.get_server(key) for key in keys], owners(ring, keys))
+            self.assertEqual([ring.assign(key) for key in keys[:10]], owners(ring, keys[:10]))
+
+    def test_bulk_changes_match_one_at_a_time(self):
+        for hasher in ('md5', 'blake2b'):
+            servers = [f"shard-{i}" for i in range(20)]
+            weights = {server: 1 + i % 3 for i, server in enumerate(servers)}
+            bulk = ConsistentHashRing(num_replicas=40, hasher=hasher)
+            bulk.add_servers(servers, weights=weights)
+            single = ConsistentHashRing(num_replicas=40, hasher=hasher)
+            for server in servers:
+                single.add_server(server, weight=weights[server])
+            np.testing.assert_array_equal(bulk._positions, single._positions)
+            np.testing.assert_array_equal(bulk._owners, single._owners)
+
+            bulk.remove_servers(servers[::3])
+            for server in servers[::3]:
+                single.remove_server(server)
+            np.testing.assert_array_equal(bulk._positions, single._positions)
+            np.testing.assert_array_equal(bulk._owners, single._owners)
+            self.assertEqual(bulk.sorted_keys, sorted(bulk.sorted_keys))
+
+
+class TestBoundedLoad(unittest.TestCase):
+    """
+    Tests for bounded-load mode: no server goes over load_factor times its share, in batch or one key at a time.
+    """
+
+    def test_distribute_keys_respects_capacity(self):
+        ring = make_ring(load_factor=1.25)
+        ring.add_server("big", weight=3)
+        mapping = ring.distribute_keys(KEYS)
+        self.assertEqual(sum(len(keys) for keys in mapping.values()), len(KEYS))
+        for server, keys in mapping.items():
+            limit = math.ceil(1.25 * len(KEYS) * ring.get_weight(server) / ring._total_weight)
+            self.assertLessEqual(len(keys), limit)
+
+    def test_assign_release_and_removal(self):
+        ring = make_ring(num_servers=4, load_factor=1.1)
+        for key in KEYS[:1000]:
+            ring.assign(key)
+        self.assertLessEqual(max(ring.server_loads().values()), math.ceil(1.1 * 1000 / 4))
+        self.assertTrue(ring.release(KEYS[0]))
+        self.assertFalse(ring.release(KEYS[0]))
+        self.assertIsNone(ring.get_assignment(KEYS[0]))
+
+        # Keys on a removed server are re-assigned to the others.
+        ring.remove_server("shard-0")
+        loads = ring.server_loads()
+        self.assertNotIn("shard-0", loads)
+        self.assertEqual(sum(loads.values()), 999)
+        self.assertTrue(all(ring.get_assignment(key) != "shard-0" for key in KEYS[1:1000]))
+
+
+class TestRebalancePlanner(unittest.TestCase):
+    """
+    Tests that the planned hash ranges describe exactly the keys that change owner.
+    """
+
+    def check_plan(self, old_ring, new_ring, plan):
+        self.assertTrue(plan)
+        hashes = old_ring.hasher.to_ints(old_ring.hash_keys(KEYS))
+        starts = [start for start, _, _, _ in plan]
+        before, after = owners(old_ring, KEYS), owners(new_ring, KEYS)
+        for h, old, new in zip(hashes, before, after):
+            i = np.searchsorted(starts, h, side='right') - 1
+            in_plan = i >= 0 and plan[i][0] <= h < plan[i][1]
+            self.assertEqual(in_plan, old != new)
+            if in_plan:
+                self.assertEqual((plan[i][2], plan[i][3]), (old, new))
+
+    def test_add_and_remove_plans_match_brute_force(self):
+        for hasher in ('blake2b', 'md5'):
+            ring = make_ring(hasher=hasher)
+            added = ring.copy()
+            added.add_servers(["new-1", "new-2"])
+            plan = ring.plan_add_servers(["new-1", "new-2"])
+            self.check_plan(ring, added, plan)
+            self.assertTrue(all(new in ("new-1", "new-2") for _, _, _, new in plan))
+
+            removed = ring.copy()
+            removed.remove_servers(["shard-3"])
+            self.check_plan(ring, removed, ring.plan_remove_servers(["shard-3"]))
+
+    def test_moved_fraction_matches_keys_moved(self):
+        ring = make_ring(num_replicas=200)
+        plan = ring.plan_add_servers(["new"])
+        added = ring.copy()
+        added.add_server("new")
+        moved = sum(a != b for a, b in zip(owners(ring, KEYS), owners(added, KEYS))) / len(KEYS)
+        self.assertAlmostEqual(moved_fraction(plan, ring.hasher.bits), moved, delta=0.01)
+        self.assertEqual(ring.plan_add_servers([]), [])
+
+
+class TestPreferenceLists(unittest.TestCase):
+    """
+    Tests for replica preference lists, single-key and batch.
+    """
+
+    def test_batch_and_single_agree_and_are_distinct(self):
+        ring = make_ring(num_servers=6)
+        keys = KEYS[:500]
+        singles = [ring.get_servers_for_key(key, 3) for key in keys]  # walked, before the table exists
+        batch = ring.get_servers_for_keys(keys, 3)
+        self.assertEqual(batch.shape, (len(keys), 3))
+        for key, single, row in zip(keys, singles, batch.tolist()):
+            self.assertEqual(single, [ring.server_table[slot] for slot in row])
+            self.assertEqual(len(set(single)), 3)
+            self.assertEqual(single[0], ring.get_server(key))
+            self.assertEqual(ring.get_servers_for_key(key, 3), single)  # now served from the table
+        self.assertEqual(ring.get_servers_for_keys(keys[:5], 10).shape, (5, 6))
+
+    def test_zone_aware_lists_span_zones(self):
+        ring = ConsistentHashRing(num_replicas=50, hasher='blake2b')
+        zones = {f"shard-{i}": f"zone-{i % 3}" for i in range(9)}
+        ring.add_servers(zones, zones=zones)
+        keys = KEYS[:300]
+        batch = ring.get_servers_for_keys(keys, 4, zone_aware=True)
+        for key, row in zip(keys, batch.tolist()):
+            servers = [ring.server_table[slot] for slot in row]
+            self.assertEqual(len({zones[s] for s in servers[:3]}), 3)
+            self.assertEqual(len(set(servers)), 4)
+            self.assertEqual(ring.get_servers_for_key(key, 4, zone_aware=True), servers)
+
+
+class TestWeights(unittest.TestCase):
+    """
+    Tests for weighted servers with proportional virtual nodes.
+    """
+
+    def test_weight_round_trip_restores_positions(self):
+        ring = make_ring()
+        positions, owner_slots = ring._positions.copy(), ring._owners.copy()
+        ring.set_weight("shard-2", 3)
+        self.assertEqual(int(np.count_nonzero(ring._owners == ring._server_slots["shard-2"])), 150)
+        ring.set_weight("shard-2", 0.5)
+        self.assertEqual(int(np.count_nonzero(ring._owners == ring._server_slots["shard-2"])), 25)
+        ring.set_weight("shard-2", 1)
+        np.testing.assert_array_equal(ring._positions, positions)
+        np.testing.assert_array_equal(ring._owners, owner_slots)
+
+
+class TestGetServerCache(unittest.TestCase):
+    """
+    Tests for the epoch-tagged get_server cache.
+    """
+
+    def test_cached_lookups_follow_membership_changes(self):
+        ring = make_ring(cache_size=1000)
+        keys = KEYS[:500]
+        first = [ring.get_server(key) for key in keys]
+        self.assertEqual([ring.get_server(key) for key in keys], first)
+        self.assertEqual(ring.cache_info()['hits'], 500)
+
+        ring.add_server("new")
+        self.assertEqual([ring.get_server(key) for key in keys], owners(ring, keys))
+        self.assertEqual(ring.cache_info()['misses'], 1000)
+        self.assertEqual(ring.cache_info()['size'], 500)
+
+
+class TestSnapshots(unittest.TestCase):
+    """
+    Tests for binary snapshots, copied and memory-mapped.
+    """
+
+    def test_snapshot_round_trip(self):
+        for hasher in ('blake2b', 'md5'):
+            ring = make_ring(hasher=hasher)
+            ring.add_server("heavy", zone="eu", weight=2)
+            ring.remove_server("shard-4")  # leaves a free slot in the server table
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "ring.bin")
+                ring.save(path)
+                for mmap in (True, False):
+                    loaded = ConsistentHashRing.load(path, mmap=mmap)
+                    self.assertEqual(loaded.get_servers(KEYS).tolist(), ring.get_servers(KEYS).tolist())
+                    self.assertEqual(loaded.server_table, ring.server_table)
+                    self.assertEqual(loaded.get_weight("heavy"), 2)
+                    self.assertEqual(loaded.get_servers_for_key(KEYS[0], 3, zone_aware=True),
+                                     ring.get_servers_for_key(KEYS[0], 3, zone_aware=True))
+                # Changing a loaded ring leaves the snapshot untouched.
+                loaded = ConsistentHashRing.load(path)
+                loaded.add_server("extra")
+                self.assertEqual(ConsistentHashRing.load(path).get_servers(KEYS).tolist(),
+                                 ring.get_servers(KEYS).tolist())
+
+
+class TestParallelRouting(unittest.TestCase):
+    """
+    Tests for multi-process routing over a shared-memory ring.
+    """
+
+    def test_parallel_routing_matches_get_servers(self):
+        ring = make_ring()
+        mapping = distribute_keys_parallel(ring, KEYS, processes=2, chunk_size=3000)
+        expected = owners(ring, KEYS)
+        self.assertEqual(sum(len(indices) for indices in mapping.values()), len(KEYS))
+        for server, indices in mapping.items():
+            self.assertTrue(all(expected[i] == server for i in indices.tolist()))
+
+
+if __name__ == "__main__":
+    unittest.main()
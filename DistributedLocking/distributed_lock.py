@@ -1,7 +1,86 @@
-import redis
 import time
 import uuid
 import random
+import weakref
+
+# redis-py is only needed to talk to a real server; the InMemoryRedis stand-in works without it.
+try:
+    from redis.exceptions import NoScriptError
+except ImportError:
+    class NoScriptError(Exception):
+        """Stand-in for redis.exceptions.NoScriptError when redis-py is not installed."""
+
+class LuaScript(str):
+    """
+    The Lua source of a Redis script, usable anywhere a script string is. `twin` is a Python function with
+    the same effect, twin(store, keys, args), which stores that cannot run Lua (InMemoryRedis) call instead.
+    """
+    def __new__(cls, source, twin=None):
+        script = super().__new__(cls, source)
+        script.twin = twin
+        return script
+
+
+def _release(store, keys, args):
+    if store.get(keys[0]) == args[0]:
+        return store.delete(keys[0])
+    return 0
+
+
+def _extend(store, keys, args):
+    if store.get(keys[0]) == args[0]:
+        return int(store.pexpire(keys[0], int(args[1])))
+    return 0
+
+
+# Deletes the lock only if it still holds our value, so we never release a lock someone else acquired
+# after ours expired.
+RELEASE_SCRIPT = LuaScript("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+""", twin=_release)
+
+# Resets the lock's TTL (ARGV[2], in ms) only if it still holds our value.
+EXTEND_SCRIPT = LuaScript("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+else
+    return 0
+end
+""", twin=_extend)
+
+# Redis client -> {script source: SHA1}. Scripts are loaded once per client and then run with EVALSHA,
+# so each call sends a 40-character hash instead of the whole script.
+_script_shas = weakref.WeakKeyDictionary()
+
+
+def run_script(redis_client, script, keys, *args):
+    """
+    Run a script with EVALSHA, loading it first if this client has not loaded it yet (or the server has
+    lost it, e.g. after a restart or SCRIPT FLUSH). WorkerIdLease (UniqueIdGeneration/) uses this too.
+    
+    Args:
+        redis_client: A Redis client instance
+        script: The script's Lua source
+        keys: The keys the script touches (KEYS)
+        args: The script's arguments (ARGV)
+        
+    Returns:
+        The script's return value
+    """
+    shas = _script_shas.setdefault(redis_client, {})
+    sha = shas.get(script)
+    if sha is None:
+        sha = shas[script] = redis_client.script_load(script)
+    try:
+        return redis_client.evalsha(sha, len(keys), *keys, *args)
+    except NoScriptError:
+        shas[script] = redis_client.script_load(script)
+        return redis_client.evalsha(shas[script], len(keys), *keys, *args)
+
 
 class DistributedLock:
     """
@@ -25,6 +104,10 @@ class DistributedLock:
         self.expire_time = expire_time
         self.lock_value = str(uuid.uuid4())  # Unique identifier for this lock instance
     
+    def _run_script(self, script, *args):
+        """Run one of the lock scripts on this lock's key (see run_script)."""
+        return run_script(self.redis, script, [self.lock_name], *args)
+    
     def acquire(self, retry_times=3, retry_delay=0.2):
         """
         Attempt to acquire the lock.
@@ -37,10 +120,9 @@ class DistributedLock:
             bool: True if the lock was acquired, False otherwise
         """
         for i in range(retry_times):
-            # Use SETNX (SET if Not eXists) to ensure atomicity
-            if self.redis.setnx(self.lock_name, self.lock_value):
-                # Set expiration to prevent deadlocks if the client crashes
-                self.redis.expire(self.lock_name, self.expire_time)
+            # SET NX PX sets the value and the expiration in one atomic command: one round trip, and a
+            # crash can never leave a lock without a TTL (which would deadlock everyone else)
+            if self.redis.set(self.lock_name, self.lock_value, nx=True, px=int(self.expire_time * 1000)):
                 return True
                 
             # If we couldn't acquire the lock, wait and retry
@@ -61,15 +143,20 @@ class DistributedLock:
             bool: True if the lock was released, False otherwise
         """
         # Use a Lua script to ensure atomicity of the check-and-delete operation
-        script = """
-        if redis.call('get', KEYS[1]) == ARGV[1] then
-            return redis.call('del', KEYS[1])
-        else
-            return 0
-        end
+        return self._run_script(RELEASE_SCRIPT, self.lock_value) == 1
+    
+    def extend(self, expire_time=None):
+        """
+        Reset the lock's expiration, e.g. before a critical section that may outlast it.
+        
+        Args:
+            expire_time: New time to live in seconds (defaults to the lock's expire_time)
+            
+        Returns:
+            bool: True if the lock was extended, False if it is no longer held by this instance
         """
-        result = self.redis.eval(script, 1, self.lock_name, self.lock_value)
-        return result == 1
+        expire_time = self.expire_time if expire_time is None else expire_time
+        return self._run_script(EXTEND_SCRIPT, self.lock_value, int(expire_time * 1000)) == 1
     
     def __enter__(self):
         """Support for using the lock as a context manager with 'with' statement."""
@@ -1,10 +1,12 @@
+import hashlib
 import threading
 import time
 import random
-import uuid
 from queue import Queue
 import logging
 
+from distributed_lock import DistributedLock, NoScriptError
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -19,7 +21,26 @@ class InMemoryRedis:
     def __init__(self):
         self._data = {}
         self._expiry = {}
-        self._lock = threading.Lock()  # For thread safety
+        self._lock = threading.RLock()  # For thread safety; re-entrant so emulated scripts can call commands
+        self._loaded = {}  # SHA1 -> Lua source, for evalsha
+    
+    def set(self, key, value, nx=False, px=None, ex=None):
+        """Set key to value, optionally only if it doesn't exist (nx) and with a TTL in ms (px) or seconds (ex)"""
+        with self._lock:
+            self._check_expiry(key)
+            if nx and key in self._data:
+                return None
+            self._data[key] = value
+            self._expiry.pop(key, None)
+            if px is not None:
+                self._expiry[key] = time.time() + px / 1000
+            elif ex is not None:
+                self._expiry[key] = time.time() + ex
+            return True
+    
+    def pexpire(self, key, milliseconds):
+        """Set an expiration on key in milliseconds"""
+        return self.expire(key, milliseconds / 1000)
     
     def setnx(self, key, value):
         """Set key to value if key doesn't exist"""
@@ -32,6 +53,7 @@ class InMemoryRedis:
     def expire(self, key, seconds):
         """Set an expiration on key"""
         with self._lock:
+            self._check_expiry(key)
             if key in self._data:
                 expiry_time = time.time() + seconds
                 self._expiry[key] = expiry_time
@@ -67,9 +89,16 @@ class InMemoryRedis:
                 self._check_expiry(key)
             return list(self._data.keys())
     
-    def eval(self, script, num_keys, key, value):
-        """Simplified implementation of Lua script eval for our release lock use case"""
+    def eval(self, script, num_keys, *keys_and_args):
+        """
+        Run a script. There is no Lua interpreter here, so a LuaScript runs its Python twin atomically
+        (under the store lock); any other script is taken to be the release lock script (delete key if it holds value)
+        """
         with self._lock:
+            handler = getattr(script, 'twin', None)
+            if handler is not None:
+                return handler(self, list(keys_and_args[:num_keys]), list(keys_and_args[num_keys:]))
+            key, value = keys_and_args[0], keys_and_args[1]
             self._check_expiry(key)
             if key in self._data and self._data[key] == value:
                 del self._data[key]
@@ -77,32 +106,27 @@ class InMemoryRedis:
                     del self._expiry[key]
                 return 1
             return 0
-
-
-class DistributedLock:
-    """
-    A distributed lock implementation using our in-memory Redis.
-    """
-    def __init__(self, redis_client, lock_name, expire_time=10):
-        self.redis = redis_client
-        self.lock_name = lock_name
-        self.expire_time = expire_time
-        self.lock_value = str(uuid.uuid4())  # Unique identifier for this lock instance
-    
-    def acquire(self, retry_times=3, retry_delay=0.2):
-        for i in range(retry_times):
-            if self.redis.setnx(self.lock_name, self.lock_value):
-                self.redis.expire(self.lock_name, self.expire_time)
-                return True
-                
-            if i < retry_times - 1:
-                time.sleep(retry_delay * (random.random() + 0.5))  # Add jitter
-                
-        return False
-    
-    def release(self):
-        # For our in-memory implementation, we simulate the Lua script
-        return self.redis.eval("", 1, self.lock_name, self.lock_value) == 1
+    
+    def script_load(self, script):
+        """Cache a script and return its SHA1, like SCRIPT LOAD"""
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        with self._lock:
+            self._loaded[sha] = script
+        return sha
+    
+    def evalsha(self, sha, num_keys, *keys_and_args):
+        """Run a script loaded with script_load"""
+        with self._lock:
+            script = self._loaded.get(sha)
+            if script is None:
+                raise NoScriptError("No matching script. Please use EVAL.")
+            return self.eval(script, num_keys, *keys_and_args)
+    
+    def script_flush(self):
+        """Forget every script loaded with script_load, like SCRIPT FLUSH (or a server restart)"""
+        with self._lock:
+            self._loaded.clear()
+            return True
 
 
 class TicketBookingSystem:
@@ -144,8 +168,7 @@ class TicketBookingSystem:
             time.sleep(process_time)
             
             # Book the seat
-            self.redis.setnx(seat_key, user_id)
-            self.redis.expire(seat_key, self.reservation_ttl)
+            self.redis.set(seat_key, user_id, nx=True, ex=self.reservation_ttl)
             logging.info(f"User {user_id} successfully booked seat {seat_id}")
             return True
             
@@ -3,7 +3,8 @@ from unittest.mock import MagicMock, patch
 import redis
 import threading
 import time
-from distributed_lock import DistributedLock
+from distributed_lock import DistributedLock, EXTEND_SCRIPT, RELEASE_SCRIPT
+from in_memory_simulation import InMemoryRedis
 from ticket_booking import TicketBookingSystem
 
 class TestDistributedLock(unittest.TestCase):
@@ -20,48 +21,101 @@ class TestDistributedLock(unittest.TestCase):
     
     def test_acquire_success(self):
         # Setup Redis mock to simulate successful lock acquisition
-        self.redis_mock.setnx.return_value = True
+        self.redis_mock.set.return_value = True
         
         # Attempt to acquire the lock
         result = self.lock.acquire()
         
-        # Verify the result and Redis calls
+        # Verify the result and Redis calls: value and TTL in one atomic command
         self.assertTrue(result)
-        self.redis_mock.setnx.assert_called_once_with(self.lock_name, self.lock.lock_value)
-        self.redis_mock.expire.assert_called_once_with(self.lock_name, self.lock.expire_time)
+        self.redis_mock.set.assert_called_once_with(self.lock_name, self.lock.lock_value, nx=True,
+                                                    px=self.lock.expire_time * 1000)
+        self.redis_mock.setnx.assert_not_called()
+        self.redis_mock.expire.assert_not_called()
     
     def test_acquire_failure(self):
-        # Setup Redis mock to simulate failed lock acquisition
-        self.redis_mock.setnx.return_value = False
+        # Setup Redis mock to simulate failed lock acquisition (SET NX returns None)
+        self.redis_mock.set.return_value = None
         
         # Attempt to acquire the lock
         result = self.lock.acquire(retry_times=1)
         
         # Verify the result and Redis calls
         self.assertFalse(result)
-        self.redis_mock.setnx.assert_called_once_with(self.lock_name, self.lock.lock_value)
+        self.redis_mock.set.assert_called_once()
     
     def test_release_success(self):
         # Setup Redis mock to simulate successful lock release
-        self.redis_mock.eval.return_value = 1
+        self.redis_mock.script_load.return_value = "release-sha"
+        self.redis_mock.evalsha.return_value = 1
         
         # Attempt to release the lock
         result = self.lock.release()
         
         # Verify the result
         self.assertTrue(result)
-        self.redis_mock.eval.assert_called_once()
+        self.redis_mock.script_load.assert_called_once_with(RELEASE_SCRIPT)
+        self.redis_mock.evalsha.assert_called_once_with("release-sha", 1, self.lock_name, self.lock.lock_value)
+        self.redis_mock.eval.assert_not_called()
     
     def test_release_failure(self):
         # Setup Redis mock to simulate failed lock release
-        self.redis_mock.eval.return_value = 0
+        self.redis_mock.evalsha.return_value = 0
         
         # Attempt to release the lock
         result = self.lock.release()
         
         # Verify the result
         self.assertFalse(result)
-        self.redis_mock.eval.assert_called_once()
+        self.redis_mock.evalsha.assert_called_once()
+    
+    def test_scripts_are_loaded_once_per_client(self):
+        self.redis_mock.script_load.side_effect = lambda script: f"sha-{len(script)}"
+        self.redis_mock.evalsha.return_value = 1
+        
+        # Several locks (and extends) on the same client share the loaded scripts
+        for i in range(3):
+            lock = DistributedLock(self.redis_mock, f"lock-{i}")
+            lock.extend()
+            lock.release()
+        
+        self.assertEqual(self.redis_mock.script_load.call_count, 2)
+        self.redis_mock.script_load.assert_any_call(EXTEND_SCRIPT)
+        self.assertEqual(self.redis_mock.evalsha.call_count, 6)
+    
+    def test_in_memory_redis_uses_the_same_commands(self):
+        store = InMemoryRedis()
+        lock = DistributedLock(store, self.lock_name, expire_time=0.05)
+        other = DistributedLock(store, self.lock_name)
+        
+        self.assertTrue(lock.acquire(retry_times=1))
+        self.assertFalse(other.acquire(retry_times=1))
+        self.assertTrue(lock.extend(10))
+        time.sleep(0.1)  # the original 50 ms TTL has passed, the extended one has not
+        self.assertFalse(other.acquire(retry_times=1))
+        self.assertFalse(other.release())
+        self.assertTrue(lock.release())
+        self.assertFalse(lock.extend())
+        self.assertTrue(other.acquire(retry_times=1))
+
+    def test_constructing_a_lock_sends_nothing(self):
+        # Script twins for InMemoryRedis travel with the scripts; the lock registers nothing on the client
+        DistributedLock(self.redis_mock, "other-lock")
+        self.assertEqual(self.redis_mock.method_calls, [])
+        self.assertTrue(callable(RELEASE_SCRIPT.twin) and callable(EXTEND_SCRIPT.twin))
+    
+    def test_scripts_are_reloaded_after_a_flush(self):
+        store = InMemoryRedis()
+        lock = DistributedLock(store, self.lock_name)
+        self.assertTrue(lock.acquire(retry_times=1))
+        self.assertTrue(lock.release())
+        
+        # The client's cached SHAs are now unknown to the store; evalsha must reload and retry
+        store.script_flush()
+        self.assertTrue(lock.acquire(retry_times=1))
+        self.assertTrue(lock.extend())
+        self.assertTrue(lock.release())
+        self.assertIsNone(store.get(self.lock_name))
 
 class TestTicketBookingSystem(unittest.TestCase):
     """
@@ -88,16 +142,16 @@ class TestTicketBookingSystem(unittest.TestCase):
         mock_redis.exists.side_effect = side_effect_exists
         mock_redis.setex.side_effect = side_effect_setex
         
-        # Configure setnx to allow only one lock acquisition per seat
+        # Configure SET NX to allow only one lock acquisition per seat
         self.locked_seats = set()
         
-        def side_effect_setnx(key, value):
-            if key in self.locked_seats:
-                return False
+        def side_effect_set(key, value, nx=False, px=None):
+            if nx and key in self.locked_seats:
+                return None
             self.locked_seats.add(key)
             return True
             
-        mock_redis.setnx.side_effect = side_effect_setnx
+        mock_redis.set.side_effect = side_effect_set
         
         # Create a ticket booking system
         booking_system = TicketBookingSystem()
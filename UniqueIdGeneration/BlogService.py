@@ -1,23 +1,76 @@
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+import numpy as np
+
 from IdGenerator import IdGenerator
+from Post import Post
+from ShardRouter import ModuloRouter
+from ShardStore import ShardStore
+
+logger = logging.getLogger(__name__)
 
 class BlogService:
-    def __init__(self, num_shards, id_generator):
+    def __init__(self, num_shards, id_generator, router=None, storage_dir=None, cache=None):
         """
         Initializes the BlogService.
         :param num_shards: The number of database shards to simulate.
         :param id_generator: An instance of the IdGenerator to create unique post IDs.
+        :param router: Decides which shard holds a user's posts (see ShardRouter.py).
+                       Defaults to the simple user_id % num_shards strategy.
+        :param storage_dir: If set, each shard is a durable ShardStore in <storage_dir>/shard-<n> instead of
+                            an in-memory dict, and posts already stored there are loaded back.
+        :param cache: Optional PostCache that get_post reads through, e.g. in front of durable shards.
         """
         self.num_shards = num_shards
-        self.shards = [{} for _ in range(num_shards)]
+        self.storage_dir = storage_dir
+        self.shards = [self._new_shard(i) for i in range(num_shards)]
+        # Per shard index: user_id -> sorted list of that user's post IDs (oldest first). Snowflake IDs are
+        # time-sortable, so paging and time-range queries are a binary search plus a slice, O(log n + k).
+        # Resharding also uses it to find and copy just the users that move.
+        self.user_posts = [self._load_user_posts(shard) for shard in self.shards]
         self.id_generator = id_generator
+        self.cache = cache
+        self.router = router or ModuloRouter(num_shards)
+
+        # While a resharding migration runs, reads fall back to the shard chosen by the old router.
+        self.previous_router = None
+        self._pending_moves = deque()  # (user_id, old shard, new shard) still to copy
+
+    def _new_shard(self, index):
+        if self.storage_dir is None:
+            return {}
+        return ShardStore(os.path.join(self.storage_dir, f"shard-{index:03d}"))
+
+    def _load_user_posts(self, shard):
+        """Rebuilds a shard's user index from a ShardStore's segment indexes, without reading any post."""
+        if not isinstance(shard, ShardStore):
+            return {}
+        post_ids, user_ids = shard.live_index()
+        order = np.argsort(user_ids, kind='stable')  # live_index is sorted by post ID, so each run stays sorted
+        users, starts = np.unique(user_ids[order], return_index=True)
+        grouped = np.split(post_ids[order], starts[1:])
+        return {user_id: ids.tolist() for user_id, ids in zip(users.tolist(), grouped)}
+
+    def close(self):
+        """Closes the shard stores, if any."""
+        for shard in self.shards:
+            if isinstance(shard, ShardStore):
+                shard.close()
+
+    def get_shard_index(self, user_id):
+        """Returns the index of the shard that holds user_id's posts."""
+        return self.router.shard_for(user_id)
 
     def get_shard(self, user_id):
         """
         Determines which shard to use for a given user_id.
-        This is a simple modulo-based sharding strategy.
+        The router decides; by default this is a simple modulo-based sharding strategy.
         """
-        shard_index = user_id % self.num_shards
-        return self.shards[shard_index]
+        return self.shards[self.get_shard_index(user_id)]
 
     def create_post(self, user_id, content):
         """
@@ -26,21 +79,194 @@ class BlogService:
         in the correct shard based on the user_id.
         """
         post_id = self.id_generator.generate_id()
-        shard = self.get_shard(user_id)
-        
-        post = {
-            'id': post_id,
-            'user_id': user_id,
-            'content': content
-        }
-        shard[post_id] = post
-        print(f"Created post {post_id} for user {user_id} on shard {user_id % self.num_shards}")
+        shard_index = self.get_shard_index(user_id)
+
+        post = Post(post_id, user_id, content)
+        self.shards[shard_index][post_id] = post
+        self._index_post(self.user_posts[shard_index], user_id, post_id)
+        logger.debug("Created post %d for user %d on shard %d", post_id, user_id, shard_index)
         return post
 
+    def create_posts(self, batch):
+        """
+        Creates many posts at once, e.g. for an import. All IDs are reserved with one generate_ids call,
+        the posts are grouped by shard, and each shard and its user index are updated once per group.
+        :param batch: Iterable of (user_id, content) pairs.
+        :return: The new posts, in the same order as batch.
+        """
+        batch = list(batch)
+        if not batch:
+            return []
+        post_ids = self.id_generator.generate_ids(len(batch))  # increasing, so every group below stays sorted
+        posts = [Post(post_id, user_id, content) for post_id, (user_id, content) in zip(post_ids.tolist(), batch)]
+
+        # Route each distinct user once instead of once per post.
+        user_ids = np.fromiter((user_id for user_id, _ in batch), dtype=np.int64, count=len(batch))
+        users, user_of_post = np.unique(user_ids, return_inverse=True)
+        user_shards = self.router.shards_for(users.tolist())
+        post_shards = user_shards[user_of_post]
+
+        # One update per shard (one append for a ShardStore).
+        shard_indices = np.unique(user_shards).tolist()
+        for shard_index in shard_indices:
+            rows = np.flatnonzero(post_shards == shard_index).tolist()
+            self.shards[shard_index].update(zip(post_ids[rows].tolist(), [posts[row] for row in rows]))
+
+        # Post IDs grouped by user (a stable sort keeps each user's IDs in increasing order).
+        grouped_ids = post_ids[np.argsort(user_of_post, kind='stable')].tolist()
+        ends = np.cumsum(np.bincount(user_of_post)).tolist()
+        start = 0
+        for user_id, shard_index, end in zip(users.tolist(), user_shards.tolist(), ends):
+            self._index_posts(self.user_posts[shard_index], user_id, grouped_ids[start:end])
+            start = end
+
+        logger.info("Created %d posts on %d shards", len(posts), len(shard_indices))
+        return posts
+
     def get_post(self, user_id, post_id):
         """
         Retrieves a blog post.
         It first determines the correct shard from the user_id and then looks up the post.
+        During a resharding migration, posts not yet copied are still found on the old shard.
+        With a cache, hits skip the shard entirely and misses are added to the cache.
         """
-        shard = self.get_shard(user_id)
-        return shard.get(post_id)
\ No newline at end of file
+        if self.cache is not None:
+            post = self.cache.get(post_id)
+            if post is not None:
+                return post if post.user_id == user_id else None
+        post = self.get_shard(user_id).get(post_id)
+        if post is None and self.previous_router is not None:
+            post = self.shards[self.previous_router.shard_for(user_id)].get(post_id)
+        if post is not None and self.cache is not None:
+            self.cache.put(post)
+        return post
+
+    def _index_post(self, index, user_id, post_id):
+        post_ids = index.get(user_id)
+        if post_ids is None:
+            index[user_id] = [post_id]
+        elif post_id > post_ids[-1]:
+            post_ids.append(post_id)  # the usual case: IDs grow with time
+        else:
+            insort(post_ids, post_id)  # e.g. an older ID from another worker arriving late
+
+    def _index_posts(self, index, user_id, post_ids):
+        """Adds a sorted run of a user's post IDs to a shard's index."""
+        existing = index.get(user_id)
+        if existing is None:
+            index[user_id] = post_ids
+        elif post_ids[0] > existing[-1]:
+            existing.extend(post_ids)
+        else:
+            existing.extend(post_ids)
+            existing.sort()
+
+    def _indexed_post_ids(self, user_id):
+        """Returns (shard, sorted post IDs) pairs holding user_id's posts: one, or two while the user is migrating."""
+        shard_index = self.get_shard_index(user_id)
+        sources = [(self.shards[shard_index], self.user_posts[shard_index].get(user_id, []))]
+        if self.previous_router is not None:
+            old_index = self.previous_router.shard_for(user_id)
+            if old_index != shard_index and user_id in self.user_posts[old_index]:
+                sources.append((self.shards[old_index], self.user_posts[old_index][user_id]))
+        return sources
+
+    def list_posts(self, user_id, before_id=None, limit=50):
+        """
+        Returns up to limit of user_id's posts, newest first, in O(log n + limit).
+        :param before_id: Only return posts with a smaller ID; pass the last ID of the previous page to page back.
+        """
+        page = []
+        for shard, post_ids in self._indexed_post_ids(user_id):
+            end = len(post_ids) if before_id is None else bisect_left(post_ids, before_id)
+            page.extend((post_id, shard) for post_id in post_ids[max(0, end - limit):end])
+        page.sort(reverse=True, key=lambda item: item[0])
+        return [shard[post_id] for post_id, shard in page[:limit]]
+
+    def list_posts_between(self, user_id, start, end, limit=None):
+        """
+        Returns user_id's posts created between start and end (datetimes or Unix seconds, both included),
+        newest first. The time range becomes an ID range through the generator's layout, so this is
+        also O(log n + k).
+        """
+        if limit == 0:
+            return []
+        low, high = self.id_generator.layout.id_bounds(start, end)
+        posts = []
+        for shard, post_ids in self._indexed_post_ids(user_id):
+            selected = post_ids[bisect_left(post_ids, low):bisect_right(post_ids, high)]
+            if limit is not None:
+                selected = selected[-limit:]
+            posts.extend(shard[post_id] for post_id in selected)
+        posts.sort(reverse=True, key=lambda post: post['id'])
+        return posts if limit is None else posts[:limit]
+
+    def start_resharding(self, new_router):
+        """
+        Switches to new_router and queues every user whose shard changes. New posts go to the new
+        shards straight away; existing posts are copied by migrate_step and stay readable meanwhile.
+        :return: The number of users that have to move.
+        """
+        if self.previous_router is not None:
+            raise Exception("A resharding migration is already running")
+        while len(self.shards) <= max(new_router.shards):
+            self.shards.append(self._new_shard(len(self.shards)))
+            self.user_posts.append(self._load_user_posts(self.shards[-1]))
+        self.num_shards = len(self.shards)
+
+        for old_shard, users in enumerate(self.user_posts):
+            if not users:
+                continue
+            user_ids = list(users)
+            for user_id, new_shard in zip(user_ids, new_router.shards_for(user_ids).tolist()):
+                if new_shard != old_shard:
+                    self._pending_moves.append((user_id, old_shard, new_shard))
+
+        self.previous_router = self.router if self._pending_moves else None
+        self.router = new_router
+        return len(self._pending_moves)
+
+    def migrate_step(self, max_users=1000):
+        """
+        Copies up to max_users pending users to their new shards, then removes them from the old ones.
+        Finishes the migration once nothing is pending.
+        :return: The number of posts moved.
+        """
+        posts_moved = 0
+        for _ in range(min(max_users, len(self._pending_moves))):
+            user_id, old_shard, new_shard = self._pending_moves.popleft()
+            old_posts, new_posts = self.shards[old_shard], self.shards[new_shard]
+            post_ids = self.user_posts[old_shard].pop(user_id, [])
+            for post_id in post_ids:
+                new_posts[post_id] = old_posts[post_id]
+            # Posts the user wrote since the switch are already on the new shard and are newer.
+            written_since = self.user_posts[new_shard].get(user_id, [])
+            merged = post_ids + written_since
+            if post_ids and written_since and post_ids[-1] > written_since[0]:
+                merged.sort()
+            self.user_posts[new_shard][user_id] = merged
+            for post_id in post_ids:
+                del old_posts[post_id]
+            posts_moved += len(post_ids)
+
+        if not self._pending_moves:
+            self.previous_router = None
+        return posts_moved
+
+    def reshard(self, new_router, batch_users=1000):
+        """
+        Runs a whole resharding migration to new_router.
+        :return: Dict with 'users_moved', 'posts_moved' and 'seconds'.
+        """
+        start = time.perf_counter()
+        users_moved = self.start_resharding(new_router)
+        posts_moved = 0
+        while self.previous_router is not None:
+            posts_moved += self.migrate_step(batch_users)
+        return {'users_moved': users_moved, 'posts_moved': posts_moved, 'seconds': time.perf_counter() - start}
+
+    def add_shards(self, count=1):
+        """Adds count empty shards and migrates the users the router now sends there. Returns the reshard report."""
+        shards = self.router.shards
+        new_shards = list(range(len(self.shards), len(self.shards) + count))
+        return self.reshard(self.router.with_shards(shards + new_shards))
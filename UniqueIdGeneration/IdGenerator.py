@@ -1,57 +1,323 @@
+import threading
 import time
+import weakref
+
+import numpy as np
+
+from SnowflakeLayout import DEFAULT_LAYOUT
+
+# How IdGenerator reacts when the clock reads earlier than the last timestamp it used.
+BACKWARD_POLICIES = ('raise', 'wait', 'borrow')
+
 
 class IdGenerator:
-    def __init__(self, worker_id):
+    def __init__(self, worker_id, datacenter_id=0, layout=None, stripe=0, stripe_bits=0, clock='monotonic',
+                 backward_policy='raise', max_backward_ms=10):
         """
         Initializes the Snowflake ID generator.
-        :param worker_id: A unique ID for this worker (0-31). This is crucial for ensuring
-                          uniqueness across multiple generator instances without coordination.
+        :param worker_id: A unique ID for this worker (0-31 with the default layout). This is crucial for
+                          ensuring uniqueness across multiple generator instances without coordination.
+        :param datacenter_id: ID of this worker's datacenter, if the layout has datacenter bits.
+        :param layout: SnowflakeLayout with the field widths and epoch. Defaults to 41/0/5/12 bits.
+        :param stripe: Optional sub-space of the sequence field owned by this generator (see StripedIdGenerator).
+        :param stripe_bits: How many of the sequence bits hold the stripe. 0 means the generator owns them all.
+        :param clock: 'monotonic' reads time.monotonic_ns() anchored to the wall clock at start-up, so NTP
+                      steps cannot move it backwards. 'wall' reads time.time_ns() on every call.
+                      A function returning nanoseconds since the layout's epoch can be passed for simulations.
+        :param backward_policy: What to do when the clock steps back by at most max_backward_ms:
+                                'raise' refuses to generate, 'wait' sleeps until the clock catches up,
+                                'borrow' keeps using the last timestamp as a logical clock.
+                                Larger steps always raise.
+        :param max_backward_ms: Largest backward step the 'wait' and 'borrow' policies absorb.
         """
+        # By default:
         # 41 bits for timestamp (in milliseconds) - gives us 69 years
         # 5 bits for worker ID - 32 workers
         # 12 bits for sequence number - 4096 IDs per millisecond per worker
+        self.layout = layout = layout or DEFAULT_LAYOUT
         self.worker_id = worker_id
+        self.datacenter_id = datacenter_id
         self.last_timestamp = -1
         self.sequence = 0
+        # The generator refuses to run at or after this timestamp; WorkerIdLease keeps moving it forward.
+        # The setter caps it at the end of the layout's timestamp range (see valid_until below).
+        self._valid_until = layout.max_timestamp + 1
 
         # Custom epoch (e.g., the first day of 2023)
-        self.epoch = 1672531200000
+        self.epoch = layout.epoch
+
+        if not 0 <= self.worker_id <= layout.max_worker_id:
+            raise ValueError(f"Worker ID must be between 0 and {layout.max_worker_id}")
+        if not 0 <= self.datacenter_id <= layout.max_datacenter_id:
+            raise ValueError(f"Datacenter ID must be between 0 and {layout.max_datacenter_id}")
+        if not 0 <= stripe_bits < layout.sequence_bits:
+            raise ValueError(f"Stripe bits must be between 0 and {layout.sequence_bits - 1}")
+        if not 0 <= stripe < (1 << stripe_bits):
+            raise ValueError(f"Stripe must be between 0 and {(1 << stripe_bits) - 1}")
+        if not callable(clock) and clock not in ('monotonic', 'wall'):
+            raise ValueError("Clock must be 'monotonic', 'wall' or a function returning nanoseconds")
+        if backward_policy not in BACKWARD_POLICIES:
+            raise ValueError(f"Backward policy must be one of: {', '.join(BACKWARD_POLICIES)}")
+
+        # The stripe takes the top bits of the sequence field, the counter keeps the rest.
+        counter_bits = layout.sequence_bits - stripe_bits
+        self._sequence_mask = (1 << counter_bits) - 1
+        self._node_bits = ((self.datacenter_id << layout.datacenter_shift) | (self.worker_id << layout.worker_shift)
+                           | (stripe << counter_bits))
+
+        self.clock = clock
+        self.backward_policy = backward_policy
+        self.max_backward_ms = max_backward_ms
+        # _clock_ns() + _clock_offset is the time in nanoseconds since the custom epoch.
+        if clock == 'monotonic':
+            self._clock_ns = time.monotonic_ns
+            self._clock_offset = time.time_ns() - self.epoch * 1_000_000 - time.monotonic_ns()
+        elif clock == 'wall':
+            self._clock_ns = time.time_ns
+            self._clock_offset = -self.epoch * 1_000_000
+        else:
+            self._clock_ns = clock
+            self._clock_offset = 0
+        if self._current_timestamp() > layout.max_timestamp:
+            raise ValueError(f"The clock is past the last timestamp the layout can encode "
+                             f"({layout.timestamp_bits} bits from epoch {self.epoch})")
+
+        # How often each slow path fired.
+        self.stats = {
+            'sequence_overflows': 0,     # a millisecond ran out of sequence numbers
+            'clock_backward_waits': 0,   # slept until a stepped-back clock caught up
+            'clock_backward_borrows': 0, # reused the last timestamp after a backward step
+            'clock_backward_errors': 0,  # refused to generate
+            'lease_expired_errors': 0,   # refused to generate because the worker ID lease ran out
+            'timestamp_overflows': 0,    # refused to generate because the clock ran past the layout's range
+        }
+
+        self.generate_id = self._specialize_generate_id()
+
+    @property
+    def valid_until(self):
+        return self._valid_until
+
+    @valid_until.setter
+    def valid_until(self, timestamp):
+        # Folding the end of the timestamp range in here keeps the overflow check out of the fast path.
+        self._valid_until = min(timestamp, self.layout.max_timestamp + 1)
+
+    def _check_valid(self, timestamp):
+        """Raises if the generator may not use timestamp: the lease ran out or the layout cannot encode it."""
+        if timestamp < self._valid_until:
+            return
+        if timestamp > self.layout.max_timestamp:
+            self.stats['timestamp_overflows'] += 1
+            raise Exception("Clock is past the layout's timestamp range. Refusing to generate id.")
+        # Another process may own our worker ID by now.
+        self.stats['lease_expired_errors'] += 1
+        raise Exception("Worker ID lease expired. Refusing to generate id.")
 
-        if not 0 <= self.worker_id < 32:
-            raise ValueError("Worker ID must be between 0 and 31")
+    def _now_ns(self):
+        return self._clock_ns() + self._clock_offset
 
     def _current_timestamp(self):
         """Returns the current time in milliseconds since the epoch."""
-        return int(time.time() * 1000) - self.epoch
+        return self._now_ns() // 1_000_000
 
-    def generate_id(self):
-        """
-        Generates a new 64-bit Snowflake ID.
-        The ID is time-sortable and globally unique across all workers.
-        """
+    def _sleep_until(self, timestamp):
+        """Sleeps (instead of spinning) until the clock reaches timestamp, then returns the current timestamp."""
+        target_ns = timestamp * 1_000_000
+        now_ns = self._now_ns()
+        while now_ns < target_ns:
+            time.sleep((target_ns - now_ns) / 1e9)
+            now_ns = self._now_ns()
+        return now_ns // 1_000_000
+
+    def _clock_timestamp(self):
+        """Reads the clock and applies the backward policy. Never returns less than last_timestamp."""
         timestamp = self._current_timestamp()
+        self._check_valid(timestamp)
+        if timestamp >= self.last_timestamp:
+            return timestamp
 
-        if timestamp < self.last_timestamp:
-            # This can happen if the system clock is set backwards.
-            # In a real-world scenario, you might want to have a more robust handling
-            # strategy, but for this prototype, we'll raise an exception.
+        # This can happen if the system clock is set backwards.
+        if self.backward_policy == 'raise' or self.last_timestamp - timestamp > self.max_backward_ms:
+            self.stats['clock_backward_errors'] += 1
             raise Exception("Clock moved backwards. Refusing to generate id.")
+        if self.backward_policy == 'wait':
+            self.stats['clock_backward_waits'] += 1
+            return self._sleep_until(self.last_timestamp)
+        self.stats['clock_backward_borrows'] += 1
+        return self.last_timestamp
 
-        if self.last_timestamp == timestamp:
-            # We are in the same millisecond as the last ID generation.
-            # Increment the sequence number.
-            self.sequence = (self.sequence + 1) & 4095  # 12-bit mask
-            if self.sequence == 0:
-                # Sequence number has overflowed. We must wait for the next millisecond.
-                while timestamp <= self.last_timestamp:
-                    timestamp = self._current_timestamp()
+    def _next_millis(self, last_timestamp):
+        """Returns the first timestamp after last_timestamp, once the sequence of last_timestamp is used up."""
+        self.stats['sequence_overflows'] += 1
+        if self.backward_policy == 'borrow' and last_timestamp + 1 - self._current_timestamp() <= self.max_backward_ms:
+            # Logical clock: move on without waiting, as long as we stay within the allowed lead.
+            timestamp = last_timestamp + 1
         else:
-            # We are in a new millisecond, so we can reset the sequence number.
-            self.sequence = 0
+            timestamp = self._sleep_until(last_timestamp + 1)
+        self._check_valid(timestamp)
+        return timestamp
+
+    def _specialize_generate_id(self):
+        """
+        Builds this generator's generate_id. The layout's shifts, the node bits, the sequence mask and the clock
+        are bound as closure constants, so a custom layout costs nothing extra per call. Backward clock steps,
+        lease expiry, running out of timestamp bits and sequence overflows go through the regular methods.
+        """
+        clock_ns, clock_offset = self._clock_ns, self._clock_offset
+        timestamp_shift, node_bits, sequence_mask = self.layout.timestamp_shift, self._node_bits, self._sequence_mask
+        clock_timestamp, next_millis = self._clock_timestamp, self._next_millis
+
+        def generate_id():
+            """
+            Generates a new 64-bit Snowflake ID.
+            The ID is time-sortable and globally unique across all workers.
+            """
+            timestamp = (clock_ns() + clock_offset) // 1_000_000
+            last_timestamp = self.last_timestamp
+            if not last_timestamp <= timestamp < self._valid_until:
+                # The clock moved backwards, the worker ID lease ran out or the timestamp no longer fits the
+                # layout; take the slow path.
+                timestamp = clock_timestamp()
+
+            if timestamp == last_timestamp:
+                # We are in the same millisecond as the last ID generation.
+                # Increment the sequence number.
+                sequence = (self.sequence + 1) & sequence_mask
+                if sequence == 0:
+                    # Sequence number has overflowed. We must wait for the next millisecond.
+                    timestamp = next_millis(last_timestamp)
+            else:
+                # We are in a new millisecond, so we can reset the sequence number.
+                sequence = 0
+
+            self.sequence = sequence
+            self.last_timestamp = timestamp
+
+            # Assemble the final ID by bit-shifting the components into place.
+            return (timestamp << timestamp_shift) | node_bits | sequence
+
+        return generate_id
+
+    def reserve_ids(self, n):
+        """
+        Claims n IDs in one pass and returns them as a list of ranges, one per millisecond used.
+        Each range is a contiguous run of sequence numbers within one millisecond, so the IDs are
+        exactly the ones n calls to generate_id would have returned: unique and strictly increasing.
+        When a millisecond's sequence numbers (4096 with the default layout) run out, it moves on to the next
+        millisecond, just like generate_id.
+        """
+        ranges = []
+        remaining = n
+        while remaining > 0:
+            timestamp = self._clock_timestamp()
+
+            if timestamp == self.last_timestamp:
+                first = self.sequence + 1
+                if first > self._sequence_mask:
+                    # This millisecond is used up. Move on to the next one.
+                    timestamp = self._next_millis(self.last_timestamp)
+                    first = 0
+            else:
+                first = 0
+
+            count = min(remaining, self._sequence_mask + 1 - first)
+            self.last_timestamp = timestamp
+            self.sequence = first + count - 1
+
+            base = (timestamp << self.layout.timestamp_shift) | self._node_bits
+            ranges.append(range(base + first, base + first + count))
+            remaining -= count
+        return ranges
+
+    def generate_ids(self, n):
+        """
+        Generates n Snowflake IDs at once and returns them as a NumPy uint64 array in increasing order.
+        See reserve_ids for the guarantees.
+        """
+        ranges = self.reserve_ids(n)
+        if not ranges:
+            return np.empty(0, dtype=np.uint64)
+        return np.concatenate([np.arange(r.start, r.stop, dtype=np.uint64) for r in ranges])
+
+
+class StripedIdGenerator:
+    """
+    Thread-safe Snowflake generator with no lock on the hot path.
+
+    The sequence field is split into `stripes` sub-spaces. Each stripe is an independent
+    IdGenerator whose IDs carry the stripe number in the top sequence bits, so two stripes can never
+    produce the same ID. A thread leases a free stripe on its first call and from then on uses it
+    exclusively, without any locking; the stripe goes back to the pool when the thread exits.
+    The price is a smaller per-thread sequence: each stripe gets 4096 / stripes IDs per millisecond (default layout),
+    and at most `stripes` threads can generate at the same time.
+
+    IDs are strictly increasing per thread and time-sortable to the millisecond across threads,
+    the same guarantee Snowflake gives across workers.
+    """
+    def __init__(self, worker_id, stripes=16, **options):
+        """
+        :param worker_id: A unique ID for this worker (0-31).
+        :param stripes: Number of sequence sub-spaces (the maximum number of concurrent threads); a power of two
+                        smaller than the number of sequence values per millisecond (4096 by default).
+        :param options: Passed to every stripe's IdGenerator (datacenter_id, layout, clock, backward_policy, ...).
+        """
+        if stripes < 1 or stripes & (stripes - 1):
+            raise ValueError("Stripes must be a power of two")
+        stripe_bits = stripes.bit_length() - 1
+        self.worker_id = worker_id
+        self.generators = [IdGenerator(worker_id, stripe=i, stripe_bits=stripe_bits, **options) for i in range(stripes)]
+        self.layout = self.generators[0].layout  # shared by every stripe; decodes IDs and maps time ranges
+        self.epoch = self.layout.epoch
+        self._free = list(range(stripes))
+        self._lease_lock = threading.Lock()  # only taken the first time a thread generates
+        self._local = threading.local()
+
+    def _lease(self):
+        """Binds a free stripe to the calling thread and returns its generator."""
+        with self._lease_lock:
+            if not self._free:
+                raise RuntimeError(f"All {len(self.generators)} stripes are in use; create the generator with more stripes")
+            stripe = self._free.pop()
+        # The lease object lives in thread-local storage, so it is collected when the thread exits
+        # and the finalizer hands the stripe back.
+        lease = _StripeLease(self.generators[stripe])
+        weakref.finalize(lease, self._release, stripe)
+        self._local.lease = lease
+        return lease.generator
+
+    def _release(self, stripe):
+        with self._lease_lock:
+            self._free.append(stripe)
+
+    def _generator(self):
+        lease = getattr(self._local, 'lease', None)
+        return lease.generator if lease is not None else self._lease()
+
+    @property
+    def stats(self):
+        """Slow-path counters summed over all stripes (see IdGenerator.stats)."""
+        totals = dict.fromkeys(self.generators[0].stats, 0)
+        for generator in self.generators:
+            for name, count in generator.stats.items():
+                totals[name] += count
+        return totals
+
+    def generate_id(self):
+        """Generates a new 64-bit Snowflake ID from the calling thread's stripe."""
+        return self._generator().generate_id()
+
+    def reserve_ids(self, n):
+        """Claims n IDs from the calling thread's stripe. See IdGenerator.reserve_ids."""
+        return self._generator().reserve_ids(n)
+
+    def generate_ids(self, n):
+        """Generates n IDs from the calling thread's stripe as a NumPy uint64 array."""
+        return self._generator().generate_ids(n)
+
 
-        self.last_timestamp = timestamp
+class _StripeLease:
+    __slots__ = ('generator', '__weakref__')
 
-        # Assemble the final ID by bit-shifting the components into place.
-        # The correct shifts should be 17 for the timestamp (5+12) and 12 for the worker ID.
-        new_id = (timestamp << 17) | (self.worker_id << 12) | self.sequence
-        return new_id
\ No newline at end of file
+    def __init__(self, generator):
+        self.generator = generator
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import struct
+from collections import deque
+
+from IdGenerator import IdGenerator
+
+# Wire protocol (all integers big-endian):
+#   request:  count (uint32)                       - how many IDs the client wants
+#   response: status (uint8), num_ranges (uint16), then num_ranges x [first_id (uint64), length (uint32)]
+# IDs come back as runs of consecutive integers (one per millisecond used, see IdGenerator.reserve_ids),
+# so a batch of thousands of IDs usually costs 15 bytes on the wire.
+REQUEST = struct.Struct('!I')
+RESPONSE_HEADER = struct.Struct('!BH')
+RANGE = struct.Struct('!QI')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class IdServer:
+    def __init__(self, generator, host='127.0.0.1', port=7070, max_batch=65536):
+        """
+        Asyncio TCP server that hands out batches of IDs from one IdGenerator.
+        :param generator: The IdGenerator to allocate from. All connections share it; they run on one event
+                          loop, so no locking is needed.
+        :param host: Interface to listen on.
+        :param port: Port to listen on; 0 picks a free port (see self.port after start()).
+        :param max_batch: Largest batch a single request can ask for.
+        """
+        self.generator = generator
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"ID server for worker {self.generator.worker_id} listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _allocate(self, count):
+        """Builds the response for one request."""
+        if count < 1:
+            return RESPONSE_HEADER.pack(STATUS_ERROR, 0)
+        count = min(count, self.max_batch)
+        try:
+            # When a millisecond runs out this sleeps until the next one, which briefly blocks the loop;
+            # every other client would be waiting for that same millisecond anyway.
+            ranges = self.generator.reserve_ids(count)
+        except Exception:
+            return RESPONSE_HEADER.pack(STATUS_ERROR, 0)
+        return RESPONSE_HEADER.pack(STATUS_OK, len(ranges)) + b''.join(RANGE.pack(r.start, len(r)) for r in ranges)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readexactly(REQUEST.size)
+                writer.write(self._allocate(REQUEST.unpack(request)[0]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+
+class IdClient:
+    def __init__(self, host='127.0.0.1', port=7070, batch_size=4096, low_water=None):
+        """
+        Client for IdServer that keeps a local buffer of IDs and refills it in the background.
+        :param batch_size: How many IDs to ask for per request; at least 1.
+        :param low_water: Start fetching the next batch once the buffer drops to this many IDs
+                          (default: half a batch), so next_id() rarely has to wait for the network.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.low_water = batch_size // 2 if low_water is None else low_water
+        self.reader = None
+        self.writer = None
+        self._ranges = deque()  # fetched ranges not yet started
+        self._next = 0          # next ID of the current range
+        self._stop = 0          # end of the current range
+        self._available = 0     # IDs left in the buffer, including the current range
+        self._prefetch = None   # in-flight fetch task, if any
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def _fetch(self):
+        self.writer.write(REQUEST.pack(self.batch_size))
+        status, num_ranges = RESPONSE_HEADER.unpack(await self.reader.readexactly(RESPONSE_HEADER.size))
+        body = await self.reader.readexactly(num_ranges * RANGE.size)
+        if status != STATUS_OK:
+            raise Exception("ID server refused to allocate IDs")
+        for first, length in RANGE.iter_unpack(body):
+            self._ranges.append((first, first + length))
+            self._available += length
+
+    def _start_prefetch(self):
+        self._prefetch = asyncio.get_running_loop().create_task(self._fetch())
+        self._prefetch.add_done_callback(self._prefetch_done)
+
+    def _prefetch_done(self, task):
+        if self._prefetch is task and not task.cancelled() and task.exception() is None:
+            self._prefetch = None
+        # A failed fetch stays in self._prefetch so the next caller that needs it sees the error.
+
+    async def next_id(self):
+        """Returns the next ID, waiting for the network only when the local buffer is empty."""
+        if self._available <= self.low_water and self._prefetch is None:
+            self._start_prefetch()
+        # Several callers can wait on the same fetch, so after every await check again whether another one
+        # has already started a fresh range; swapping in a second range would drop the rest of the first.
+        while self._next == self._stop:
+            if self._ranges:
+                self._next, self._stop = self._ranges.popleft()
+                break
+            if self._prefetch is None:
+                self._start_prefetch()
+            task = self._prefetch
+            try:
+                await task  # re-raises a failed fetch
+            finally:
+                if self._prefetch is task:
+                    self._prefetch = None
+        new_id = self._next
+        self._next += 1
+        self._available -= 1
+        return new_id
+
+
+async def serve(worker_id, host, port):
+    server = IdServer(IdGenerator(worker_id), host, port)
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio TCP service that hands out Snowflake IDs in batches")
+    parser.add_argument('--worker-id', type=int, default=1, help='Worker ID of this server (default: 1)')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=7070, help='Port to listen on (default: 7070)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.worker_id, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Stopping server")
+
+
+if __name__ == "__main__":
+    main()
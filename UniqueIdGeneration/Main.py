@@ -1,5 +1,6 @@
 from IdGenerator import IdGenerator
 from BlogService import BlogService
+import logging
 import time
 
 class Main:
@@ -18,18 +19,20 @@ class Main:
         post2 = self.blog_service.create_post(user_id, "This is my second blog post!")
 
         # Retrieve the posts
-        self.blog_service.get_post(user_id, post1['post_id'])
-        self.blog_service.get_post(user_id, post2['post_id'])
+        self.blog_service.get_post(user_id, post1['id'])
+        self.blog_service.get_post(user_id, post2['id'])
 
         # user on the same shard
         user_id2 = 12349  # This user will be on the same shard as user_id 12345
         post3 = self.blog_service.create_post(user_id2, "User 12349's first blog post!")
-        self.blog_service.get_post(user_id2, post3['post_id'])
+        self.blog_service.get_post(user_id2, post3['id'])
 
         print("--- Final Shard States ---")
         for i, shard in enumerate(self.blog_service.shards):
             print(f"Shard {i}: {shard}")
 
 if __name__ == "__main__":
+    # BlogService logs each created post at DEBUG level.
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     main = Main()
     main.run()
\ No newline at end of file
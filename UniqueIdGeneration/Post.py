@@ -0,0 +1,46 @@
+import sys
+
+
+class Post:
+    """
+    A blog post. Uses __slots__ instead of a per-post dict: 56 bytes per record instead of 184 for the
+    {'id', 'user_id', 'content'} dict, which is most of a shard's memory once there are millions of posts.
+    Still subscriptable (post['id']) and compares equal to the equivalent dict, so callers written against
+    the dict representation keep working.
+    """
+    __slots__ = ('id', 'user_id', 'content')
+    FIELDS = __slots__
+
+    def __init__(self, id, user_id, content):
+        self.id = id
+        self.user_id = user_id
+        self.content = content
+
+    def __getitem__(self, key):
+        if key not in Post.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        return Post.FIELDS
+
+    def to_dict(self):
+        return {'id': self.id, 'user_id': self.user_id, 'content': self.content}
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by this record: the object, its ID and its content."""
+        return sys.getsizeof(self) + sys.getsizeof(self.id) + sys.getsizeof(self.content)
+
+    def __eq__(self, other):
+        if isinstance(other, Post):
+            return self.id == other.id and self.user_id == other.user_id and self.content == other.content
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Post(id={self.id}, user_id={self.user_id}, content={self.content!r})"
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+# Per-entry cost of the OrderedDict itself (hash slot plus linked-list node), measured with tracemalloc on
+# CPython 3.11.
+ENTRY_OVERHEAD = 105
+
+
+class PostCache:
+    """
+    A bounded LRU cache of Post records, sized in bytes rather than entries, so a few long posts cannot
+    blow the budget. Keyed by post ID alone: snowflake IDs are unique across shards, and a post keeps its
+    ID when resharding moves it.
+    """
+    def __init__(self, max_bytes=64 << 20):
+        """
+        :param max_bytes: Memory budget for cached records, including the cache's own per-entry overhead.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # post ID -> (post, size); least recently used first
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    def get(self, post_id):
+        """Returns the cached post and marks it as recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(post_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(post_id)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, post):
+        """Caches post, evicting the least recently used posts until it fits. Posts bigger than the budget are skipped."""
+        size = post.nbytes + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(post.id, None)
+            if old is not None:
+                self.bytes -= old[1]
+            while self.bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats['evictions'] += 1
+            self._entries[post.id] = (post, size)
+            self.bytes += size
+
+    def invalidate(self, post_id):
+        with self._lock:
+            entry = self._entries.pop(post_id, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, post_id):
+        return post_id in self._entries
+
+    @property
+    def hit_ratio(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def metrics(self):
+        """Returns a dict with the counters plus entries, bytes, max_bytes and hit_ratio."""
+        return dict(self.stats, entries=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes,
+                    hit_ratio=self.hit_ratio)
@@ -0,0 +1,121 @@
+import os
+import sys
+
+import numpy as np
+
+CONSISTENT_HASHING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ConsistentHashing')
+
+
+class ModuloRouter:
+    """
+    The original sharding strategy: user_id % num_shards. Cheap, but changing the number
+    of shards moves almost every user.
+    """
+    def __init__(self, num_shards):
+        self.num_shards = num_shards
+
+    @property
+    def shards(self):
+        return list(range(self.num_shards))
+
+    def shard_for(self, user_id):
+        return user_id % self.num_shards
+
+    def shards_for(self, user_ids):
+        """Vectorized shard_for. Returns a NumPy array of shard indices."""
+        return np.asarray(user_ids, dtype=np.int64) % self.num_shards
+
+    def with_shards(self, shards):
+        """Returns a new router over the given shard indices (must be 0..n-1)."""
+        if sorted(shards) != list(range(len(shards))):
+            raise ValueError("ModuloRouter needs shards numbered 0..n-1")
+        return ModuloRouter(len(shards))
+
+
+class ConsistentHashRouter:
+    """
+    Routes users with a ConsistentHashRing whose servers are shard indices. Adding or removing a shard only
+    moves the users on the ring ranges that change owner, about 1/n of them.
+    """
+    def __init__(self, shards, num_replicas=100, hasher='blake2b'):
+        """
+        :param shards: Shard indices (or a shard count, meaning 0..n-1).
+        :param num_replicas: Virtual nodes per shard.
+        :param hasher: Ring hasher name (see hashers.py).
+        """
+        # Imported here rather than at module level, so the other routers (and BlogService) do not need the
+        # ConsistentHashing/ prototype next to this directory.
+        if CONSISTENT_HASHING_DIR not in sys.path:
+            sys.path.insert(0, CONSISTENT_HASHING_DIR)
+        from ConsistentHashRing import ConsistentHashRing
+
+        if isinstance(shards, int):
+            shards = range(shards)
+        self.num_replicas = num_replicas
+        self.hasher = hasher
+        self.ring = ConsistentHashRing(num_replicas=num_replicas, hasher=hasher)
+        self.ring.add_servers(shards)
+
+    @property
+    def shards(self):
+        return sorted(self.ring.servers)
+
+    def shard_for(self, user_id):
+        return self.ring.get_server(user_id)
+
+    def shards_for(self, user_ids):
+        """Vectorized shard_for. Returns a NumPy array of shard indices."""
+        table = np.array([-1 if s is None else s for s in self.ring.server_table], dtype=np.int64)
+        return table[self.ring.get_servers(list(user_ids))]
+
+    def with_shards(self, shards):
+        """Returns a new router over the given shards, sharing the vnode positions of the shards both have."""
+        router = ConsistentHashRouter.__new__(ConsistentHashRouter)
+        router.num_replicas, router.hasher = self.num_replicas, self.hasher
+        router.ring = self.ring.copy()
+        router.ring.remove_servers(set(self.ring.servers) - set(shards))
+        router.ring.add_servers(s for s in shards if s not in self.ring.servers)
+        return router
+
+
+class DirectoryRouter:
+    """
+    Directory-based sharding: an explicit user -> shard table, with a fallback router for users
+    that are not in the table. Any user can be placed anywhere (e.g. to isolate a hot user),
+    at the cost of storing one entry per placed user.
+    """
+    def __init__(self, fallback, directory=None):
+        """
+        :param fallback: Router for users without a directory entry.
+        :param directory: Optional initial dict of user_id -> shard index.
+        """
+        self.fallback = fallback
+        self.directory = dict(directory or {})
+
+    @property
+    def shards(self):
+        return sorted(set(self.fallback.shards) | set(self.directory.values()))
+
+    def place(self, user_id, shard):
+        """Pins user_id to shard."""
+        self.directory[user_id] = shard
+
+    def shard_for(self, user_id):
+        shard = self.directory.get(user_id)
+        return self.fallback.shard_for(user_id) if shard is None else shard
+
+    def shards_for(self, user_ids):
+        """Vectorized shard_for. Returns a NumPy array of shard indices."""
+        user_ids = list(user_ids)
+        result = self.fallback.shards_for(user_ids)
+        for i, user_id in enumerate(user_ids):
+            shard = self.directory.get(user_id)
+            if shard is not None:
+                result[i] = shard
+        return result
+
+    def with_shards(self, shards):
+        """Returns a new router whose fallback covers the given shards. Entries on removed shards are dropped."""
+        keep = set(shards)
+        return DirectoryRouter(self.fallback.with_shards(shards),
+                               {u: s for u, s in self.directory.items() if s in keep})
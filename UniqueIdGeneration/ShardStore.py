@@ -0,0 +1,424 @@
+import os
+import re
+import struct
+import threading
+import zlib
+from mmap import mmap as MemoryMap, ACCESS_READ
+
+import numpy as np
+
+from Post import Post
+
+# Record: crc32 of the rest of the record, post ID, flags, user ID, content length, then the UTF-8 content.
+RECORD_HEADER = struct.Struct('<IQBqI')
+FLAG_PUT = 0
+FLAG_DELETE = 1  # tombstone
+
+# A sealed segment ends with a footer, starting at an 8-byte boundary so the arrays can be searched in place:
+# the index sorted by post ID as four arrays (ids uint64, user IDs int64, offsets uint32, flags uint8) with the
+# numbers of the segments it replaced (uint64, only after compaction) between the 8- and the narrower arrays,
+# then this trailer: magic, footer start, number of index entries, number of replaced segments.
+FOOTER_TRAILER = struct.Struct('<8sQQQ')
+FOOTER_MAGIC = b'SHRDSEG1'
+
+SEGMENT_NAME = re.compile(r'^segment-(\d{8})\.log$')
+
+
+def _encode(post_id, post):
+    content = post['content'].encode('utf-8')
+    body = RECORD_HEADER.pack(0, post_id, FLAG_PUT, post['user_id'], len(content))[4:] + content
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _encode_tombstone(post_id):
+    body = RECORD_HEADER.pack(0, post_id, FLAG_DELETE, 0, 0)[4:]
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _decode(buffer, offset):
+    """Decodes the post stored at offset. With an mmap buffer the content is decoded in place, without a read."""
+    _, post_id, _, user_id, length = RECORD_HEADER.unpack_from(buffer, offset)
+    start = offset + RECORD_HEADER.size
+    return Post(post_id, user_id, str(memoryview(buffer)[start:start + length], 'utf-8'))
+
+
+class _Segment:
+    """One log file. Either active (appended to, indexed by a dict) or sealed (read-only, mmapped footer index)."""
+
+    def __init__(self, path, number):
+        self.path = path
+        self.number = number
+        self.sealed = False
+        self.replaces = []
+        # Active state
+        self.file = None
+        self.size = 0
+        self.entries = {}  # post ID -> (offset, flag, user ID); later writes overwrite earlier ones
+        # Sealed state: NumPy views into the mmap, so opening a segment copies nothing
+        self.mm = None
+        self.ids = self.offsets = self.flags = self.user_ids = None
+
+    @classmethod
+    def open(cls, path, number):
+        segment = cls(path, number)
+        if not segment._load_footer():
+            segment._recover()
+        return segment
+
+    def _load_footer(self):
+        size = os.path.getsize(self.path)
+        if size < FOOTER_TRAILER.size:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(size - FOOTER_TRAILER.size)
+            magic, start, count, num_replaced = FOOTER_TRAILER.unpack(f.read(FOOTER_TRAILER.size))
+            if (magic != FOOTER_MAGIC or start % 8
+                    or start + count * 21 + num_replaced * 8 + FOOTER_TRAILER.size != size):
+                return False
+            self.mm = MemoryMap(f.fileno(), 0, access=ACCESS_READ)
+        self.ids = np.frombuffer(self.mm, dtype='<u8', count=count, offset=start)
+        self.user_ids = np.frombuffer(self.mm, dtype='<i8', count=count, offset=start + 8 * count)
+        self.replaces = np.frombuffer(self.mm, dtype='<u8', count=num_replaced, offset=start + 16 * count).tolist()
+        start += 16 * count + 8 * num_replaced
+        self.offsets = np.frombuffer(self.mm, dtype='<u4', count=count, offset=start)
+        self.flags = np.frombuffer(self.mm, dtype=np.uint8, count=count, offset=start + 4 * count)
+        # Segments cover narrow, mostly disjoint ID ranges (IDs grow with time), so most lookups skip them.
+        self.min_id, self.max_id = (int(self.ids[0]), int(self.ids[-1])) if count else (1, 0)
+        self.sealed = True
+        return True
+
+    def _recover(self):
+        """Rebuilds the index of an unsealed segment by scanning it, dropping a torn record at the end."""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            crc, post_id, flag, user_id, length = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+                break
+            self.entries[post_id] = (offset, flag, user_id)
+            offset = end
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.size = offset
+
+    @classmethod
+    def create(cls, path, number):
+        segment = cls(path, number)
+        segment.file = open(path, 'w+b')
+        return segment
+
+    def append(self, records, fsync):
+        """Appends (post_id, flag, user_id, encoded record) tuples with one write."""
+        offset = self.size
+        for post_id, flag, user_id, record in records:
+            self.entries[post_id] = (offset, flag, user_id)
+            offset += len(record)
+        self.file.write(b''.join(record for _, _, _, record in records))
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+        self.size = offset
+
+    def lookup(self, post_id):
+        """Returns (offset, flag) of the newest entry for post_id in this segment, or None."""
+        if not self.sealed:
+            entry = self.entries.get(post_id)
+            return None if entry is None else entry[:2]
+        if not self.min_id <= post_id <= self.max_id:
+            return None
+        i = int(self.ids.searchsorted(np.uint64(post_id)))
+        if i < len(self.ids) and self.ids[i] == post_id:
+            return int(self.offsets[i]), int(self.flags[i])
+        return None
+
+    def read(self, offset):
+        if self.sealed:
+            return _decode(self.mm, offset)
+        header = os.pread(self.file.fileno(), RECORD_HEADER.size, offset)
+        length = RECORD_HEADER.unpack(header)[4]
+        return _decode(header + os.pread(self.file.fileno(), length, offset + RECORD_HEADER.size), 0)
+
+    def index_arrays(self):
+        """Returns the index as (ids, offsets, flags, user_ids) arrays sorted by post ID."""
+        if self.sealed:
+            return self.ids, self.offsets, self.flags, self.user_ids
+        ids = np.fromiter(self.entries.keys(), dtype=np.uint64, count=len(self.entries))
+        values = np.array(list(self.entries.values()), dtype=np.int64).reshape(-1, 3)
+        order = np.argsort(ids, kind='stable')
+        return (ids[order], values[order, 0].astype(np.uint32), values[order, 1].astype(np.uint8),
+                values[order, 2])
+
+    def seal(self, replaces=()):
+        """Writes the footer index and reopens the segment read-only through mmap."""
+        ids, offsets, flags, user_ids = self.index_arrays()
+        replaces = np.asarray(replaces, dtype='<u8')
+        start = -(-self.size // 8) * 8
+        self.file.seek(self.size)
+        self.file.write(bytes(start - self.size) + ids.astype('<u8').tobytes() + user_ids.astype('<i8').tobytes()
+                        + replaces.tobytes() + offsets.astype('<u4').tobytes() + flags.tobytes()
+                        + FOOTER_TRAILER.pack(FOOTER_MAGIC, start, len(ids), len(replaces)))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+        self.entries = {}
+        if not self._load_footer():
+            raise Exception(f"Could not read back the footer of {self.path}")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.mm is not None:
+            self.ids = self.offsets = self.flags = self.user_ids = None
+            try:
+                self.mm.close()
+            except BufferError:
+                pass  # a caller still holds an index array; the mapping goes away with it
+            self.mm = None
+
+
+class ShardStore:
+    """
+    Durable storage for one shard's posts: a dict-like store backed by segmented append-only log files.
+
+    Every write is appended to the active segment. Once it grows past segment_size it is sealed: a footer
+    with the segment's index, sorted by snowflake ID (8 + 4 + 1 + 8 bytes per post), is appended and the file
+    is then read through mmap. Lookups binary-search the segments newest first and decode the post straight
+    from the mapping. Deletes write tombstones. compact() (or the background thread from start_compaction)
+    rewrites the sealed segments into one, keeping only the newest live version of each post.
+
+    On restart, sealed segments are opened from their footers without reading any records. Only the active
+    segment is scanned, and a torn record at its end is cut off.
+    """
+    def __init__(self, directory, segment_size=64 << 20, fsync=False):
+        """
+        :param directory: Where the segment files live; created if needed.
+        :param segment_size: Seal the active segment once it holds this many bytes (at most 4 GiB).
+        :param fsync: fsync after every write. Without it, writes survive a process crash but not a power cut.
+        """
+        if not 0 < segment_size <= 1 << 32:
+            raise ValueError("Segment size must be between 1 byte and 4 GiB")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        # Held for a whole compaction, so two compactions never write the same output or race on the swap.
+        self._compaction_lock = threading.Lock()
+        self._compactor = None
+        self._stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+        segments = []
+        for name in sorted(os.listdir(directory)):
+            match = SEGMENT_NAME.match(name)
+            if match:
+                segments.append(_Segment.open(os.path.join(directory, name), int(match.group(1))))
+            elif name.endswith('.compact'):
+                os.remove(os.path.join(directory, name))  # compaction that never finished
+        # A compaction that crashed before deleting its inputs: the output's footer lists them.
+        replaced = {n for s in segments for n in s.replaces}
+        for segment in [s for s in segments if s.number in replaced]:
+            segment.close()
+            os.remove(segment.path)
+        segments = [s for s in segments if s.number not in replaced]
+
+        self._sealed = [s for s in segments if s.sealed]  # oldest first
+        unsealed = [s for s in segments if not s.sealed]
+        for segment in unsealed[:-1]:
+            segment.seal()
+            self._sealed.append(segment)
+        self._sealed.sort(key=lambda s: s.number)
+        self._last_number = max((s.number for s in segments), default=0)
+        self._active = unsealed[-1] if unsealed else self._new_segment()
+
+    def _new_segment(self):
+        self._last_number += 1
+        return _Segment.create(os.path.join(self.directory, f"segment-{self._last_number:08d}.log"),
+                               self._last_number)
+
+    def _write(self, records):
+        with self._lock:
+            start = 0
+            while start < len(records):
+                # Fill the active segment up to segment_size (at least one record), then roll over.
+                room, end = self.segment_size - self._active.size, start
+                while end < len(records) and (end == start or room >= len(records[end][3])):
+                    room -= len(records[end][3])
+                    end += 1
+                self._active.append(records[start:end], self.fsync)
+                start = end
+                if self._active.size >= self.segment_size:
+                    self._active.seal()
+                    self._sealed.append(self._active)
+                    self._active = self._new_segment()
+
+    def __setitem__(self, post_id, post):
+        self._write([(post_id, FLAG_PUT, post['user_id'], _encode(post_id, post))])
+
+    def update(self, items):
+        """Stores many posts with one write per segment. Takes a mapping or (post_id, post) pairs."""
+        if hasattr(items, 'items'):
+            items = items.items()
+        self._write([(post_id, FLAG_PUT, post['user_id'], _encode(post_id, post)) for post_id, post in items])
+
+    def __delitem__(self, post_id):
+        with self._lock:
+            if self._find(post_id) is None:
+                raise KeyError(post_id)
+            self._write([(post_id, FLAG_DELETE, 0, _encode_tombstone(post_id))])
+
+    def _find(self, post_id):
+        """Returns (segment, offset) of the live version of post_id, or None."""
+        for segment in [self._active] + self._sealed[::-1]:
+            entry = segment.lookup(post_id)
+            if entry is not None:
+                offset, flag = entry
+                return None if flag == FLAG_DELETE else (segment, offset)
+        return None
+
+    def get(self, post_id, default=None):
+        with self._lock:
+            found = self._find(post_id)
+            return default if found is None else found[0].read(found[1])
+
+    def __getitem__(self, post_id):
+        post = self.get(post_id)
+        if post is None:
+            raise KeyError(post_id)
+        return post
+
+    def __contains__(self, post_id):
+        with self._lock:
+            return self._find(post_id) is not None
+
+    def live_index(self):
+        """
+        Returns (post_ids, user_ids) arrays of every live post, sorted by post ID, built from the segment
+        indexes alone. O(n log n); used to rebuild in-memory indexes on start-up.
+        """
+        # Concatenate under the lock: a compaction closes the segments it replaces, dropping their arrays.
+        with self._lock:
+            arrays = [segment.index_arrays() for segment in [self._active] + self._sealed[::-1]]
+            ids = np.concatenate([a[0] for a in arrays])
+            flags = np.concatenate([a[2] for a in arrays])
+            user_ids = np.concatenate([a[3] for a in arrays])
+        # Newest segment first, so the first occurrence of an ID is its current version.
+        unique_ids, first = np.unique(ids, return_index=True)
+        live = flags[first] == FLAG_PUT
+        return unique_ids[live], user_ids[first][live]
+
+    def __len__(self):
+        return len(self.live_index()[0])
+
+    def __iter__(self):
+        return iter(self.live_index()[0].tolist())
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        for post_id in self:
+            post = self.get(post_id)
+            if post is not None:
+                yield post_id, post
+
+    def values(self):
+        for _, post in self.items():
+            yield post
+
+    def garbage_ratio(self):
+        """Fraction of sealed index entries that are tombstones or superseded versions."""
+        with self._lock:
+            sealed = self._sealed[::-1]
+            total = sum(len(s.ids) for s in sealed)
+            if total == 0:
+                return 0.0
+            ids = np.concatenate([s.ids for s in sealed])
+            flags = np.concatenate([s.flags for s in sealed])
+        _, first = np.unique(ids, return_index=True)
+        return 1 - np.count_nonzero(flags[first] == FLAG_PUT) / total
+
+    def compact(self):
+        """
+        Merges all sealed segments into one that holds only the newest live version of each post.
+        Writes and reads continue meanwhile; the store lock is only taken to snapshot and to swap segments.
+        Only one compaction runs at a time; a second call waits for the first.
+        :return: The number of bytes reclaimed.
+        """
+        with self._compaction_lock:
+            return self._compact()
+
+    def _compact(self):
+        # Only compactions close sealed segments, so the inputs stay open while we read them unlocked.
+        with self._lock:
+            inputs = list(self._sealed)
+        if not inputs or (len(inputs) == 1 and self.garbage_ratio() == 0):
+            return 0
+
+        # Current version of each post among the inputs, newest segment first.
+        newest_first = inputs[::-1]
+        ids = np.concatenate([s.ids for s in newest_first])
+        flags = np.concatenate([s.flags for s in newest_first])
+        offsets = np.concatenate([s.offsets for s in newest_first])
+        source = np.concatenate([np.full(len(s.ids), i) for i, s in enumerate(newest_first)])
+        _, first = np.unique(ids, return_index=True)
+        # Tombstones can be dropped: the inputs include the oldest segment, so nothing older can reappear.
+        first = first[flags[first] == FLAG_PUT]
+
+        number = inputs[-1].number
+        path = inputs[-1].path
+        output = _Segment.create(path + '.compact', number)
+        records, chunk_bytes = [], 0
+        for i in first.tolist():
+            segment, offset = newest_first[source[i]], int(offsets[i])
+            _, post_id, _, user_id, length = RECORD_HEADER.unpack_from(segment.mm, offset)
+            # Copy the record bytes straight out of the old segment's mapping.
+            records.append((post_id, FLAG_PUT, user_id, segment.mm[offset:offset + RECORD_HEADER.size + length]))
+            chunk_bytes += RECORD_HEADER.size + length
+            if chunk_bytes >= 1 << 20:
+                output.append(records, fsync=False)
+                records, chunk_bytes = [], 0
+        output.append(records, fsync=False)
+        if output.size >= 1 << 32:
+            raise Exception("Compacted segment would exceed 4 GiB")
+        output.seal(replaces=[s.number for s in inputs[:-1]])
+
+        with self._lock:
+            reclaimed = sum(os.path.getsize(s.path) for s in inputs) - os.path.getsize(output.path)
+            output.close()
+            os.replace(output.path, path)
+            compacted = _Segment.open(path, number)
+            self._sealed = [compacted] + self._sealed[len(inputs):]
+            for segment in inputs:
+                segment.close()
+                if segment.path != path:
+                    os.remove(segment.path)
+        return reclaimed
+
+    def start_compaction(self, interval=30.0, min_garbage=0.3):
+        """Runs compact() in a daemon thread every interval seconds whenever garbage_ratio() >= min_garbage."""
+        def run():
+            while not self._stop.wait(interval):
+                with self._compaction_lock:
+                    if self.garbage_ratio() >= min_garbage:
+                        self._compact()
+        self._compactor = threading.Thread(target=run, name=f"compactor-{self.directory}", daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def flush(self):
+        """Forces the active segment to disk."""
+        with self._lock:
+            os.fsync(self._active.file.fileno())
+
+    def close(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._compaction_lock, self._lock:
+            for segment in [self._active] + self._sealed:
+                segment.close()
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime
+
+import numpy as np
+
+
+class SnowflakeLayout:
+    """
+    Bit layout of a Snowflake ID, from the most to the least significant bits:
+
+        [ timestamp | datacenter ID | worker ID | sequence ]
+
+    The widths must add up to at most 63 bits so every ID is a non-negative signed 64-bit integer.
+    The default is the classic 41/0/5/12 layout with an epoch at the first day of 2023.
+    """
+    def __init__(self, timestamp_bits=41, datacenter_bits=0, worker_bits=5, sequence_bits=12, epoch=1672531200000):
+        """
+        :param timestamp_bits: Milliseconds since the epoch; 41 bits last about 69 years.
+        :param datacenter_bits: Datacenter ID; 0 if there is only one datacenter.
+        :param worker_bits: Worker ID within a datacenter.
+        :param sequence_bits: Counter within one millisecond on one worker.
+        :param epoch: Custom epoch in milliseconds since the Unix epoch.
+        """
+        for name, bits in (('timestamp', timestamp_bits), ('datacenter', datacenter_bits),
+                           ('worker', worker_bits), ('sequence', sequence_bits)):
+            if not isinstance(bits, int) or bits < 0:
+                raise ValueError(f"{name.capitalize()} bits must be a non-negative integer")
+        if timestamp_bits == 0 or sequence_bits == 0:
+            raise ValueError("Timestamp and sequence need at least one bit each")
+        total_bits = timestamp_bits + datacenter_bits + worker_bits + sequence_bits
+        if total_bits > 63:
+            raise ValueError(f"Layout needs {total_bits} bits, but a Snowflake ID has only 63")
+        if epoch < 0:
+            raise ValueError("Epoch must not be negative")
+
+        self.timestamp_bits = timestamp_bits
+        self.datacenter_bits = datacenter_bits
+        self.worker_bits = worker_bits
+        self.sequence_bits = sequence_bits
+        self.epoch = epoch
+
+        self.worker_shift = sequence_bits
+        self.datacenter_shift = sequence_bits + worker_bits
+        self.timestamp_shift = sequence_bits + worker_bits + datacenter_bits
+
+        self.max_timestamp = (1 << timestamp_bits) - 1
+        self.max_datacenter_id = (1 << datacenter_bits) - 1
+        self.max_worker_id = (1 << worker_bits) - 1
+        self.max_sequence = (1 << sequence_bits) - 1
+
+    def decode_id(self, snowflake_id):
+        """
+        Splits one ID into its fields.
+        :return: Dict with 'timestamp' (milliseconds since the Unix epoch), 'worker_id', 'sequence'
+                 and, if the layout has datacenter bits, 'datacenter_id'.
+        """
+        fields = {'timestamp': (snowflake_id >> self.timestamp_shift) + self.epoch}
+        if self.datacenter_bits:
+            fields['datacenter_id'] = (snowflake_id >> self.datacenter_shift) & self.max_datacenter_id
+        fields['worker_id'] = (snowflake_id >> self.worker_shift) & self.max_worker_id
+        fields['sequence'] = snowflake_id & self.max_sequence
+        return fields
+
+    def decode_ids(self, snowflake_ids):
+        """
+        Vectorized decode_id: splits an array of IDs into one NumPy array per field, with the same keys as
+        decode_id. Timestamps are int64 milliseconds since the Unix epoch, the other fields are int64 too.
+        """
+        ids = np.asarray(snowflake_ids, dtype=np.uint64)
+        fields = {'timestamp': (ids >> np.uint64(self.timestamp_shift)).astype(np.int64) + self.epoch}
+        if self.datacenter_bits:
+            fields['datacenter_id'] = ((ids >> np.uint64(self.datacenter_shift))
+                                       & np.uint64(self.max_datacenter_id)).astype(np.int64)
+        fields['worker_id'] = ((ids >> np.uint64(self.worker_shift)) & np.uint64(self.max_worker_id)).astype(np.int64)
+        fields['sequence'] = (ids & np.uint64(self.max_sequence)).astype(np.int64)
+        return fields
+
+    def _timestamp(self, when):
+        """Converts a datetime or Unix time in seconds to a timestamp field value, clamped to the layout's range."""
+        seconds = when.timestamp() if isinstance(when, datetime) else when
+        return min(max(math.floor(seconds * 1000) - self.epoch, 0), self.max_timestamp)
+
+    def min_id(self, when):
+        """Smallest ID any worker can generate at or after `when` (a datetime or Unix time in seconds)."""
+        return self._timestamp(when) << self.timestamp_shift
+
+    def max_id(self, when):
+        """Largest ID any worker can generate in the millisecond containing `when`."""
+        return (self._timestamp(when) << self.timestamp_shift) | ((1 << self.timestamp_shift) - 1)
+
+    def id_bounds(self, start, end):
+        """
+        Inclusive ID bounds for a wall-clock range: every ID generated between start and end (both included,
+        at millisecond precision) satisfies low <= id <= high. Useful for range scans over ID-keyed storage.
+        :return: (low, high)
+        """
+        return self.min_id(start), self.max_id(end)
+
+    def __repr__(self):
+        return (f"SnowflakeLayout(timestamp_bits={self.timestamp_bits}, datacenter_bits={self.datacenter_bits}, "
+                f"worker_bits={self.worker_bits}, sequence_bits={self.sequence_bits}, epoch={self.epoch})")
+
+    def __eq__(self, other):
+        if not isinstance(other, SnowflakeLayout):
+            return NotImplemented
+        return repr(self) == repr(other)
+
+    def __hash__(self):
+        return hash(repr(self))
+
+
+DEFAULT_LAYOUT = SnowflakeLayout()
+
+
+# Decoding helpers for IDs that use the default layout.
+decode_id = DEFAULT_LAYOUT.decode_id
+decode_ids = DEFAULT_LAYOUT.decode_ids
+id_bounds = DEFAULT_LAYOUT.id_bounds
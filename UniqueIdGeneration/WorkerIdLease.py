@@ -0,0 +1,161 @@
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from IdGenerator import IdGenerator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'DistributedLocking'))
+# A lease is a lock on a worker ID slot: renewing and releasing it use DistributedLock's scripts.
+from distributed_lock import EXTEND_SCRIPT, RELEASE_SCRIPT, LuaScript, run_script
+
+
+# Python twin of CLAIM_SCRIPT, for the InMemoryRedis stand-in which cannot run Lua.
+def _claim(store, keys, args):
+    owner, ttl_ms, start = args[0], int(args[1]), int(args[2])
+    for i in range(len(keys)):
+        slot = (start + i) % len(keys)
+        if store.set(keys[slot], owner, nx=True, px=ttl_ms):
+            return slot
+    return -1
+
+
+# Claims the first free slot starting at ARGV[3], so the whole start-up is one round trip instead of
+# one SET NX per slot. KEYS are the slot keys, ARGV[1] the owner token, ARGV[2] the TTL in ms.
+CLAIM_SCRIPT = LuaScript("""
+local n = #KEYS
+for i = 0, n - 1 do
+    local slot = (tonumber(ARGV[3]) + i) % n
+    if redis.call('set', KEYS[slot + 1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+        return slot
+    end
+end
+return -1
+""", twin=_claim)
+
+
+class WorkerIdLease:
+    """
+    Leases a free worker ID from a Redis-style store, so generators do not need a hand-assigned worker_id.
+
+    Each worker ID is a key "<namespace>:worker:<id>" holding a random owner token with a TTL. acquire()
+    claims a free one with a single Lua script call; a background thread renews the TTL every
+    renew_interval seconds. Bound generators stop generating as soon as the lease is lost (another owner
+    took the key) or could not be renewed before it expired, because from then on another process may
+    be using the same worker ID.
+    """
+    def __init__(self, redis_client, namespace='snowflake', max_workers=32, ttl=10.0, renew_interval=None):
+        """
+        :param redis_client: A redis.Redis client, or InMemoryRedis from DistributedLocking for local runs.
+        :param namespace: Key prefix, so several ID spaces can share one store.
+        :param max_workers: Number of worker IDs to choose from (2^worker_bits of the layout).
+        :param ttl: Lease lifetime in seconds. A crashed holder's ID becomes free after at most this long.
+        :param renew_interval: Seconds between renewals (default: a third of the TTL).
+        """
+        self.redis = redis_client
+        self.namespace = namespace
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.renew_interval = ttl / 3 if renew_interval is None else renew_interval
+        self.owner = str(uuid.uuid4())
+        self.worker_id = None
+        self.lost = False
+        self.generators = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._renewed_at = None  # time.monotonic() just before the last successful claim or renewal
+
+    def _key(self, worker_id):
+        return f"{self.namespace}:worker:{worker_id}"
+
+    @property
+    def ttl_ms(self):
+        return int(self.ttl * 1000)
+
+    def acquire(self):
+        """
+        Claims a free worker ID in one round trip and starts the renewal thread.
+        :return: The worker ID.
+        """
+        keys = [self._key(i) for i in range(self.max_workers)]
+        # Start at a random slot so processes starting together do not all race for slot 0. The claim runs
+        # once per lease, so plain EVAL keeps it to one round trip; renewals below go through EVALSHA.
+        sent_at = time.monotonic()
+        slot = int(self.redis.eval(CLAIM_SCRIPT, len(keys), *keys, self.owner, self.ttl_ms,
+                                   random.randrange(self.max_workers)))
+        if slot < 0:
+            raise RuntimeError(f"All {self.max_workers} worker IDs in '{self.namespace}' are leased")
+        self.worker_id = slot
+        self._renewed_at = sent_at
+        self._thread = threading.Thread(target=self._renew_loop, name=f"lease-{self.namespace}-{slot}", daemon=True)
+        self._thread.start()
+        return slot
+
+    def renew(self):
+        """Extends the lease. Returns False (and stops bound generators) if someone else owns it now."""
+        sent_at = time.monotonic()
+        if run_script(self.redis, EXTEND_SCRIPT, [self._key(self.worker_id)], self.owner, self.ttl_ms) == 1:
+            self._renewed_at = sent_at
+            for generator in self.generators:
+                self._extend(generator, sent_at)
+            return True
+        self._lose()
+        return False
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.renew_interval):
+            try:
+                if not self.renew():
+                    return
+            except Exception:
+                # The store is unreachable; keep trying. Bound generators stop on their own once
+                # the last renewal's TTL has run out.
+                pass
+
+    def _extend(self, generator, sent_at):
+        """Lets generator run until the lease expires, counted from before the renewal was sent."""
+        elapsed_ms = int((time.monotonic() - sent_at) * 1000)
+        generator.valid_until = generator._current_timestamp() - elapsed_ms + self.ttl_ms
+
+    def _lose(self):
+        self.lost = True
+        self._stop.set()
+        for generator in self.generators:
+            generator.valid_until = -1
+
+    def bind(self, generator):
+        """Makes generator stop generating whenever this lease is lost or expires."""
+        if generator.worker_id != self.worker_id:
+            raise ValueError(f"Generator has worker ID {generator.worker_id}, but the lease is for {self.worker_id}")
+        self.generators.append(generator)
+        if self.lost:
+            generator.valid_until = -1
+        else:
+            self._extend(generator, self._renewed_at)
+        return generator
+
+    def generator(self, **options):
+        """Acquires a worker ID if needed and returns a bound IdGenerator for it. Options go to IdGenerator."""
+        if self.worker_id is None:
+            self.acquire()
+        return self.bind(IdGenerator(self.worker_id, **options))
+
+    def release(self):
+        """Stops renewing and frees the worker ID for other processes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for generator in self.generators:
+            generator.valid_until = -1
+        if self.worker_id is not None and not self.lost:
+            run_script(self.redis, RELEASE_SCRIPT, [self._key(self.worker_id)], self.owner)
+
+    def __enter__(self):
+        if self.worker_id is None:
+            self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -0,0 +1,61 @@
+import logging
+import os
+import random
+import time
+
+from BlogService import BlogService, logger
+from IdGenerator import IdGenerator
+from ShardRouter import ConsistentHashRouter
+
+
+def make_batch(num_posts, num_users, seed=3):
+    rng = random.Random(seed)
+    return [(rng.randrange(num_users), f"imported post {i}") for i in range(num_posts)]
+
+
+def one_by_one(service, batch):
+    for user_id, content in batch:
+        service.create_post(user_id, content)
+
+
+def in_batches(batch_size):
+    def ingest(service, batch):
+        for start in range(0, len(batch), batch_size):
+            service.create_posts(batch[start:start + batch_size])
+    return ingest
+
+
+def measure(ingest, batch, num_shards, log_level):
+    logger.setLevel(log_level)
+    service = BlogService(num_shards, IdGenerator(worker_id=1), router=ConsistentHashRouter(num_shards))
+    start = time.perf_counter()
+    ingest(service, batch)
+    elapsed = time.perf_counter() - start
+    assert sum(len(shard) for shard in service.shards) == len(batch)
+    return len(batch) / elapsed
+
+
+if __name__ == "__main__":
+    NUM_SHARDS = 8
+    NUM_USERS = 10_000
+    NUM_POSTS = 100_000
+
+    # Send log records somewhere cheap but real, so enabled logging still pays for formatting and I/O.
+    devnull = open(os.devnull, 'w')
+    logger.addHandler(logging.StreamHandler(devnull))
+    logger.propagate = False
+
+    batch = make_batch(NUM_POSTS, NUM_USERS)
+    modes = [
+        ('create_post, a log line per post', one_by_one, logging.DEBUG),
+        ('create_post, debug logging off', one_by_one, logging.INFO),
+        ('create_posts, batches of 10,000', in_batches(10_000), logging.INFO),
+        ('create_posts, one batch', in_batches(NUM_POSTS), logging.INFO),
+    ]
+    print(f"--- Importing {NUM_POSTS:,} posts for {NUM_USERS:,} users into {NUM_SHARDS} shards ---")
+    print(f"{'mode':<36}{'posts/sec':>12}{'speed-up':>10}")
+    baseline = None
+    for name, ingest, level in modes:
+        rate = measure(ingest, batch, NUM_SHARDS, level)
+        baseline = baseline or rate
+        print(f"{name:<36}{rate:>12,.0f}{rate / baseline:>9.1f}x")
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import time
+from multiprocessing import Process
+
+import numpy as np
+
+from IdService import IdClient, serve
+
+
+def run_server(host, port):
+    asyncio.run(serve(1, host, port))
+
+
+async def run_client(host, port, num_ids, batch_size, low_water):
+    """Draws num_ids IDs through one client. Returns (ids, per-call latencies in microseconds)."""
+    client = IdClient(host, port, batch_size=batch_size, low_water=low_water)
+    await client.connect()
+    ids = [0] * num_ids
+    latencies = np.empty(num_ids)
+    clock = time.perf_counter_ns
+    try:
+        for i in range(num_ids):
+            start = clock()
+            ids[i] = await client.next_id()
+            latencies[i] = (clock() - start) / 1000
+    finally:
+        await client.close()
+    return ids, latencies
+
+
+async def load_test(host, port, num_clients, ids_per_client, batch_size, low_water):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(host, port, ids_per_client, batch_size, low_water)
+                                     for _ in range(num_clients)))
+    elapsed = time.perf_counter() - start
+    ids = [i for client_ids, _ in results for i in client_ids]
+    latencies = np.concatenate([client_latencies for _, client_latencies in results])
+    if len(set(ids)) != len(ids):
+        raise AssertionError(f"{len(ids) - len(set(ids))} duplicate IDs handed out")
+    return {
+        'ids_per_sec': len(ids) / elapsed,
+        'p50_us': float(np.percentile(latencies, 50)),
+        'p99_us': float(np.percentile(latencies, 99)),
+        'max_us': float(latencies.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the ID allocation service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7071)
+    parser.add_argument('--external', action='store_true',
+                        help='Test a server that is already running instead of starting a local one')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--ids', type=int, default=200_000, help='IDs drawn per client (default: 200000)')
+    args = parser.parse_args()
+
+    server = None
+    if not args.external:
+        server = Process(target=run_server, args=(args.host, args.port), daemon=True)
+        server.start()
+        time.sleep(0.5)  # let the server bind
+
+    try:
+        print(f"{args.clients} clients x {args.ids:,} IDs against {args.host}:{args.port}")
+        print(f"{'mode':<28}{'IDs/sec':>12}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+        # batch_size=1 with no prefetch is one round trip per ID, for comparison.
+        modes = [('1 ID per request', 1, -1), ('batch 4096, no prefetch', 4096, -1), ('batch 4096, prefetch', 4096, None)]
+        for name, batch_size, low_water in modes:
+            ids = args.ids if batch_size > 1 else max(1, args.ids // 20)
+            r = asyncio.run(load_test(args.host, args.port, args.clients, ids, batch_size, low_water))
+            print(f"{name:<28}{r['ids_per_sec']:>12,.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['max_us']:>10.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
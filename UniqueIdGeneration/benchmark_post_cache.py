@@ -0,0 +1,78 @@
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from BlogService import BlogService
+from IdGenerator import IdGenerator
+from Post import Post
+from PostCache import PostCache
+
+
+def shard_memory_mb(make_post, post_ids, user_ids, contents):
+    """Memory held by one in-memory shard (post ID -> post) with the given post representation."""
+    tracemalloc.start()
+    shard = {post_id: make_post(post_id, user_id, content)
+             for post_id, user_id, content in zip(post_ids, user_ids, contents)}
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del shard
+    return used / 2 ** 20
+
+
+def as_dict(post_id, user_id, content):
+    return {
+        'id': post_id,
+        'user_id': user_id,
+        'content': content
+    }
+
+
+def zipf_reads(posts, num_reads, skew=1.1, seed=7):
+    """(user_id, post_id) reads where the k-th most popular post is read proportionally to 1 / k^skew."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(posts))]
+    return [(post['user_id'], post['id']) for post in rng.choices(posts, weights=weights, k=num_reads)]
+
+
+def read_all(service, reads):
+    start = time.perf_counter()
+    for user_id, post_id in reads:
+        service.get_post(user_id, post_id)
+    return len(reads) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    NUM_POSTS = 1_000_000
+    NUM_USERS = 50_000
+    NUM_READS = 200_000
+    CACHE_MB = 4
+
+    post_ids = IdGenerator(worker_id=1).generate_ids(NUM_POSTS).tolist()
+    user_ids = [post_id % NUM_USERS for post_id in post_ids]
+    contents = [f"post {i}" for i in range(NUM_POSTS)]  # shared by both runs, so only the records differ
+    as_dicts = shard_memory_mb(as_dict, post_ids, user_ids, contents)
+    as_records = shard_memory_mb(Post, post_ids, user_ids, contents)
+    print(f"--- Shard memory for {NUM_POSTS:,} posts (excluding content strings) ---")
+    print(f"{'dict per post':<28}{as_dicts:>10.1f} MiB")
+    print(f"{'Post (__slots__)':<28}{as_records:>10.1f} MiB  ({1 - as_records / as_dicts:.0%} less)")
+
+    # Read-through caching in front of durable shards, with skewed (Zipf) reads.
+    directory = tempfile.mkdtemp(prefix='post-cache-')
+    try:
+        service = BlogService(8, IdGenerator(worker_id=1), storage_dir=directory)
+        posts = service.create_posts(zip(user_ids[:200_000], contents[:200_000]))
+        reads = zipf_reads(posts, NUM_READS)
+        print(f"\n--- {NUM_READS:,} Zipf reads over {len(posts):,} stored posts, {CACHE_MB} MiB cache ---")
+        uncached = read_all(service, reads)
+        print(f"{'no cache':<28}{uncached:>10,.0f} reads/sec")
+        service.cache = PostCache(max_bytes=CACHE_MB << 20)
+        cached = read_all(service, reads)
+        metrics = service.cache.metrics()
+        print(f"{'read-through PostCache':<28}{cached:>10,.0f} reads/sec  ({cached / uncached:.1f}x)")
+        print(f"hit ratio {metrics['hit_ratio']:.1%}, {metrics['entries']:,} entries, "
+              f"{metrics['bytes'] / 2 ** 20:.1f} of {CACHE_MB} MiB, {metrics['evictions']:,} evictions")
+        service.close()
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,62 @@
+import functools
+import random
+import time
+
+from BlogService import BlogService
+from IdGenerator import IdGenerator
+from ShardRouter import ConsistentHashRouter
+
+
+def scan_posts(service, user_id, before_id=None, limit=50):
+    """What list_posts would cost without the index: filter and sort the user's whole shard."""
+    posts = [p for p in service.get_shard(user_id).values()
+             if p['user_id'] == user_id and (before_id is None or p['id'] < before_id)]
+    posts.sort(reverse=True, key=lambda post: post['id'])
+    return posts[:limit]
+
+
+def per_query_us(fn, queries):
+    start = time.perf_counter()
+    for args in queries:
+        fn(*args)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+    NUM_SHARDS = 16
+    NUM_USERS = 50_000
+    NUM_POSTS = 1_000_000
+    NUM_QUERIES = 200
+
+    service = BlogService(NUM_SHARDS, IdGenerator(worker_id=1), router=ConsistentHashRouter(NUM_SHARDS))
+    rng = random.Random(7)
+    # Skewed activity: a few users write most of the posts.
+    weights = [1 / (rank + 1) for rank in range(NUM_USERS)]
+    authors = rng.choices(range(NUM_USERS), weights=weights, k=NUM_POSTS)
+    start, started_at = time.perf_counter(), time.time()
+    service.create_posts((user_id, f"post {i}") for i, user_id in enumerate(authors))
+    loaded_at = time.time()
+    print(f"Loaded {NUM_POSTS:,} posts for {NUM_USERS:,} users on {NUM_SHARDS} shards "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    users = rng.sample(range(200), NUM_QUERIES // 2) + rng.sample(range(NUM_USERS), NUM_QUERIES // 2)
+    latest = [(u,) for u in users]
+    pages = []
+    for u in users:
+        first_page = service.list_posts(u, limit=50)
+        if first_page:
+            pages.append((u, first_page[-1]['id']))
+    middle = started_at + (loaded_at - started_at) / 2
+    ranges = [(u, middle, middle + 0.5) for u in users]
+
+    # Both paths must agree.
+    for u, before_id in pages[:20]:
+        assert service.list_posts(u, before_id) == scan_posts(service, u, before_id)
+
+    print(f"{'query':<32}{'index us':>12}{'scan us':>12}{'speed-up':>10}")
+    scan = functools.partial(scan_posts, service)
+    for name, queries in [('latest 50 posts', latest), ('next page (before_id)', pages)]:
+        indexed, scanned = per_query_us(service.list_posts, queries), per_query_us(scan, queries[:20])
+        print(f"{name:<32}{indexed:>12.1f}{scanned:>12.1f}{scanned / indexed:>9.0f}x")
+    indexed = per_query_us(service.list_posts_between, ranges)
+    print(f"{'posts in a 0.5 s window':<32}{indexed:>12.1f}")
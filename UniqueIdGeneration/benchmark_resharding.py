@@ -0,0 +1,38 @@
+import random
+
+from BlogService import BlogService
+from IdGenerator import IdGenerator
+from ShardRouter import ConsistentHashRouter, DirectoryRouter, ModuloRouter
+
+
+def load_service(router, num_shards, num_users, num_posts):
+    service = BlogService(num_shards, IdGenerator(worker_id=1), router=router)
+    rng = random.Random(42)
+    service.create_posts((rng.randrange(num_users), f"post {i}") for i in range(num_posts))
+    return service
+
+
+def check_all_readable(service, posts):
+    for user_id, post_id in posts:
+        assert service.get_post(user_id, post_id) is not None, f"post {post_id} of user {user_id} lost"
+
+
+if __name__ == "__main__":
+    NUM_SHARDS = 8
+    NUM_USERS = 20_000
+    NUM_POSTS = 200_000
+
+    routers = {
+        'modulo': ModuloRouter(NUM_SHARDS),
+        'consistent hash': ConsistentHashRouter(NUM_SHARDS),
+        'directory + ring': DirectoryRouter(ConsistentHashRouter(NUM_SHARDS)),
+    }
+    print(f"--- Adding shard {NUM_SHARDS + 1}: {NUM_USERS:,} users, {NUM_POSTS:,} posts on {NUM_SHARDS} shards ---")
+    print(f"{'router':<20}{'users moved':>14}{'posts moved':>14}{'% moved':>10}{'seconds':>10}")
+    for name, router in routers.items():
+        service = load_service(router, NUM_SHARDS, NUM_USERS, NUM_POSTS)
+        posts = [(post['user_id'], post_id) for shard in service.shards for post_id, post in shard.items()]
+        report = service.add_shards(1)
+        check_all_readable(service, posts)
+        print(f"{name:<20}{report['users_moved']:>14,}{report['posts_moved']:>14,}"
+              f"{100 * report['posts_moved'] / NUM_POSTS:>10.1f}{report['seconds']:>10.3f}")
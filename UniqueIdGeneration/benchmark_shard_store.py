@@ -0,0 +1,66 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from IdGenerator import IdGenerator
+from ShardStore import ShardStore
+
+
+def write_posts(directory, post_ids, segment_size):
+    store = ShardStore(directory, segment_size=segment_size)
+    start = time.perf_counter()
+    for i in range(0, len(post_ids), 10_000):
+        store.update((post_id, {'id': post_id, 'user_id': post_id % 1000, 'content': f"post {post_id}"})
+                     for post_id in post_ids[i:i + 10_000])
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    NUM_POSTS = 1_000_000
+    NUM_READS = 100_000
+    SEGMENT_SIZE = 8 << 20
+
+    post_ids = IdGenerator(worker_id=1).generate_ids(NUM_POSTS).tolist()
+    directory = tempfile.mkdtemp(prefix='shard-store-')
+    try:
+        elapsed = write_posts(directory, post_ids, SEGMENT_SIZE)
+        files = [f for f in os.listdir(directory) if f.endswith('.log')]
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+        print(f"--- {NUM_POSTS:,} posts in {len(files)} segments, {size / 2 ** 20:.1f} MiB ---")
+        print(f"{'write (batches of 10,000)':<36}{NUM_POSTS / elapsed:>12,.0f} posts/sec")
+
+        store, elapsed = timed(lambda: ShardStore(directory, segment_size=SEGMENT_SIZE))
+        print(f"{'restart from segment footers':<36}{elapsed * 1000:>12.1f} ms")
+        _, elapsed = timed(store.live_index)
+        print(f"{'rebuild live index (ids, users)':<36}{elapsed * 1000:>12.1f} ms")
+
+        # The same posts in one segment that was never sealed: a restart has to scan every record.
+        unsealed = os.path.join(directory, 'unsealed')
+        write_posts(unsealed, post_ids, 1 << 32)
+        scanned, elapsed = timed(lambda: ShardStore(unsealed, segment_size=1 << 32))
+        print(f"{'restart by scanning the log':<36}{elapsed * 1000:>12.1f} ms")
+        scanned.close()
+
+        sample = random.Random(5).sample(post_ids, NUM_READS)
+        _, elapsed = timed(lambda: [store[post_id] for post_id in sample])
+        print(f"{'random reads through mmap':<36}{NUM_READS / elapsed:>12,.0f} reads/sec")
+
+        # Overwrite half of the posts, then compact the superseded versions away.
+        store.update((post_id, {'id': post_id, 'user_id': post_id % 1000, 'content': "edited"})
+                     for post_id in post_ids[::2])
+        print(f"{'garbage after editing half':<36}{store.garbage_ratio():>12.0%}")
+        reclaimed, elapsed = timed(store.compact)
+        print(f"{'compaction':<36}{elapsed * 1000:>12.1f} ms, {reclaimed / 2 ** 20:.1f} MiB reclaimed")
+        store.close()
+    finally:
+        shutil.rmtree(directory)
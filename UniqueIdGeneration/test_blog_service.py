@@ -0,0 +1,208 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from IdGenerator import IdGenerator, StripedIdGenerator
+from BlogService import BlogService
+from Post import Post
+from PostCache import ENTRY_OVERHEAD, PostCache
+from ShardRouter import ConsistentHashRouter, DirectoryRouter, ModuloRouter
+
+
+def make_service(num_shards=4, router=None):
+    return BlogService(num_shards, IdGenerator(worker_id=1), router=router)
+
+
+def create_posts(service, user_ids, posts_per_user):
+    return [service.create_post(user_id, f"post {i} by {user_id}")
+            for i in range(posts_per_user) for user_id in user_ids]
+
+
+class TestResharding(unittest.TestCase):
+    """
+    Tests for moving users between shards while the service keeps serving reads and writes.
+    """
+
+    def test_reads_work_during_migration(self):
+        service = make_service(router=ConsistentHashRouter(4))
+        posts = create_posts(service, range(200), 5)
+        moving = service.start_resharding(service.router.with_shards([0, 1, 2, 3, 4]))
+        self.assertGreater(moving, 0)
+
+        # Half-way through, every post is readable and new posts land on the new shards.
+        service.migrate_step(max_users=moving // 2)
+        self.assertIsNotNone(service.previous_router)
+        posts += create_posts(service, range(200), 1)
+        for post in posts:
+            self.assertEqual(service.get_post(post['user_id'], post['id']), post)
+
+        while service.previous_router is not None:
+            service.migrate_step()
+        for post in posts:
+            self.assertEqual(service.get_post(post['user_id'], post['id']), post)
+            self.assertIn(post['id'], service.get_shard(post['user_id']))
+        self.assertEqual(sum(len(shard) for shard in service.shards), len(posts))
+
+    def test_only_affected_users_move(self):
+        service = make_service(router=ConsistentHashRouter(4))
+        create_posts(service, range(1000), 2)
+        before = {user_id: service.get_shard_index(user_id) for user_id in range(1000)}
+        report = service.add_shards(1)
+        moved = [u for u in range(1000) if service.get_shard_index(u) != before[u]]
+        self.assertEqual(report['users_moved'], len(moved))
+        self.assertEqual(report['posts_moved'], 2 * len(moved))
+        self.assertTrue(all(service.get_shard_index(u) == 4 for u in moved))
+        self.assertLess(len(moved), 400)
+
+    def test_directory_router_pins_users(self):
+        router = DirectoryRouter(ModuloRouter(4))
+        service = make_service(router=router)
+        post = create_posts(service, [7], 1)[0]
+        pinned = DirectoryRouter(ModuloRouter(4), {7: 0})
+        report = service.reshard(pinned)
+        self.assertEqual(report['posts_moved'], 1)
+        self.assertIn(post['id'], service.shards[0])
+
+    def test_imports_without_consistent_hashing(self):
+        # Only ConsistentHashRouter needs the sibling ConsistentHashing/ directory.
+        with tempfile.TemporaryDirectory() as directory:
+            copy = os.path.join(directory, 'UniqueIdGeneration')
+            shutil.copytree(os.path.dirname(os.path.abspath(__file__)), copy,
+                            ignore=shutil.ignore_patterns('__pycache__'))
+            script = ("from BlogService import BlogService\n"
+                      "from IdGenerator import IdGenerator\n"
+                      "service = BlogService(2, IdGenerator(worker_id=1))\n"
+                      "post = service.create_post(7, 'hello')\n"
+                      "assert service.get_post(7, post['id']) == post\n")
+            result = subprocess.run([sys.executable, '-c', script], cwd=copy, capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+
+
+class TestPostIndex(unittest.TestCase):
+    """
+    Tests for the per-user post index: paging with before_id and time-range queries.
+    """
+
+    def test_pages_are_newest_first_and_complete(self):
+        service = make_service()
+        posts = create_posts(service, [1, 2], 120)
+        expected = sorted((p['id'] for p in posts if p['user_id'] == 1), reverse=True)
+        seen, before_id = [], None
+        while True:
+            page = service.list_posts(1, before_id=before_id, limit=50)
+            if not page:
+                break
+            seen.extend(p['id'] for p in page)
+            before_id = page[-1]['id']
+        self.assertEqual(seen, expected)
+
+    def test_time_range(self):
+        service = make_service()
+        create_posts(service, [3], 10)
+        time.sleep(0.01)
+        start = time.time()
+        inside = create_posts(service, [3], 10)
+        end = time.time()
+        time.sleep(0.01)
+        create_posts(service, [3], 10)
+        found = service.list_posts_between(3, start, end)
+        self.assertEqual([p['id'] for p in found], sorted((p['id'] for p in inside), reverse=True))
+        self.assertEqual(len(service.list_posts_between(3, start, end, limit=4)), 4)
+        self.assertEqual(service.list_posts_between(3, start, end, limit=0), [])
+
+    def test_time_range_with_striped_generator(self):
+        service = BlogService(2, StripedIdGenerator(worker_id=1, stripes=4))
+        start = time.time()
+        threads = [threading.Thread(target=create_posts, args=(service, [3], 25)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        end = time.time()
+        found = service.list_posts_between(3, start, end)
+        self.assertEqual(len(found), 75)
+        self.assertEqual([p['id'] for p in found], sorted((p['id'] for p in found), reverse=True))
+
+    def test_listing_during_migration_sees_both_shards(self):
+        service = make_service(router=ModuloRouter(4))
+        old_posts = create_posts(service, [5], 3)
+        service.start_resharding(ModuloRouter(5))
+        new_posts = create_posts(service, [5], 2)
+        listed = [p['id'] for p in service.list_posts(5)]
+        self.assertEqual(listed, sorted((p['id'] for p in old_posts + new_posts), reverse=True))
+
+
+
+class TestBulkIngestion(unittest.TestCase):
+    """
+    Tests for create_posts: a batch must end up exactly where create_post would have put each post.
+    """
+
+    def test_batch_matches_single_inserts(self):
+        batch = [(user_id % 37, f"imported {user_id}") for user_id in range(5000)]
+        bulk = make_service(router=ConsistentHashRouter(4))
+        posts = bulk.create_posts(batch)
+        self.assertEqual([(p['user_id'], p['content']) for p in posts], batch)
+        self.assertEqual(len({p['id'] for p in posts}), len(batch))
+        for post in posts:
+            self.assertIs(bulk.get_post(post['user_id'], post['id']), post)
+        for user_id in range(37):
+            mine = [p['id'] for p in posts if p['user_id'] == user_id]
+            self.assertEqual([p['id'] for p in bulk.list_posts(user_id, limit=1000)], mine[::-1])
+
+    def test_batch_after_single_posts_keeps_index_sorted(self):
+        service = make_service()
+        first = service.create_post(1, "single")
+        service.create_posts([(1, "a"), (2, "b"), (1, "c")])
+        self.assertEqual([p['content'] for p in service.list_posts(1)], ["c", "a", "single"])
+        self.assertEqual(service.list_posts(1)[-1], first)
+        self.assertEqual(service.create_posts([]), [])
+
+
+class TestPostCache(unittest.TestCase):
+    """
+    Tests for the Post record and the byte-bounded LRU cache that get_post reads through.
+    """
+
+    def test_post_behaves_like_the_old_dict(self):
+        post = Post(5, 1, "hi")
+        self.assertEqual(post, {'id': 5, 'user_id': 1, 'content': "hi"})
+        self.assertEqual(post['content'], "hi")
+        self.assertEqual(dict(post), post.to_dict())
+        with self.assertRaises(AttributeError):
+            post.extra = 1
+
+    def test_evicts_least_recently_used_within_budget(self):
+        posts = [Post(i, 1, "x" * 100) for i in range(10)]
+        size = posts[0].nbytes + ENTRY_OVERHEAD
+        cache = PostCache(max_bytes=3 * size)
+        for post in posts[:3]:
+            cache.put(post)
+        cache.get(0)  # 1 is now the least recently used
+        cache.put(posts[3])
+        self.assertNotIn(1, cache)
+        self.assertEqual([i for i in range(4) if i in cache], [0, 2, 3])
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+        cache.put(Post(99, 1, "x" * (4 * size)))  # larger than the whole budget
+        self.assertNotIn(99, cache)
+        self.assertEqual(cache.metrics()['evictions'], 1)
+
+    def test_get_post_reads_through(self):
+        cache = PostCache()
+        service = BlogService(4, IdGenerator(worker_id=1), cache=cache)
+        post = service.create_post(3, "cached")
+        self.assertIs(service.get_post(3, post['id']), post)
+        self.assertIs(service.get_post(3, post['id']), post)
+        self.assertIsNone(service.get_post(4, post['id']))  # another user's post is not returned from the cache
+        self.assertEqual(cache.metrics()['hits'], 2)
+        self.assertEqual(cache.metrics()['misses'], 1)
+        self.assertAlmostEqual(cache.hit_ratio, 2 / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
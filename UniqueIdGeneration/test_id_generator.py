@@ -0,0 +1,340 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import threading
+import time
+from IdGenerator import IdGenerator, StripedIdGenerator
+from IdService import IdClient, IdServer, RESPONSE_HEADER, STATUS_ERROR
+from SnowflakeLayout import SnowflakeLayout
+from WorkerIdLease import WorkerIdLease
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'DistributedLocking'))
+from distributed_lock import EXTEND_SCRIPT, RELEASE_SCRIPT
+from in_memory_simulation import InMemoryRedis
+
+
+def run_threads(generate, num_threads, ids_per_thread):
+    """Calls generate() ids_per_thread times on each of num_threads threads. Returns (ids, seconds)."""
+    results = [None] * num_threads
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = [generate() for _ in range(ids_per_thread)]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+class TestStripedIdGenerator(unittest.TestCase):
+    """
+    Stress tests for StripedIdGenerator: many threads generating at once must never
+    produce a duplicate, and each thread must see strictly increasing IDs.
+    """
+
+    def test_no_duplicates_under_contention(self):
+        generator = StripedIdGenerator(worker_id=7, stripes=16)
+        for num_threads in (1, 2, 4, 8, 16):
+            results, _ = run_threads(generator.generate_id, num_threads, 20_000)
+            ids = [i for per_thread in results for i in per_thread]
+            self.assertEqual(len(ids), len(set(ids)), f"duplicates with {num_threads} threads")
+            for per_thread in results:
+                self.assertEqual(per_thread, sorted(per_thread))
+            self.assertTrue(all((i >> 12) & 31 == 7 for i in ids))
+
+    def test_batches_do_not_overlap_single_ids(self):
+        generator = StripedIdGenerator(worker_id=1, stripes=8)
+        results, _ = run_threads(lambda: generator.generate_ids(5000).tolist() + [generator.generate_id()], 8, 20)
+        ids = [i for per_thread in results for batch in per_thread for i in batch]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_stripes_are_returned_when_threads_exit(self):
+        generator = StripedIdGenerator(worker_id=1, stripes=2)
+        for _ in range(3):
+            run_threads(generator.generate_id, 2, 10)
+        self.assertEqual(sorted(generator._free), [0, 1])
+
+    def test_stripe_validation(self):
+        with self.assertRaises(ValueError):
+            StripedIdGenerator(worker_id=1, stripes=3)
+        with self.assertRaises(ValueError):
+            IdGenerator(worker_id=1, stripe=4, stripe_bits=2)
+
+
+class TestClockHandling(unittest.TestCase):
+    """
+    Tests for the clock policies, driven by a fake clock so backward steps and
+    sequence overflows can be produced on demand.
+    """
+
+    def make_generator(self, **options):
+        self.now_ms = 1000
+        return IdGenerator(worker_id=3, clock=lambda: self.now_ms * 1_000_000, **options)
+
+    def advance_clock(self, seconds):
+        self.now_ms += max(1, round(seconds * 1000))
+
+    def test_raise_policy_refuses_backward_step(self):
+        generator = self.make_generator()
+        generator.generate_id()
+        self.now_ms -= 2
+        with self.assertRaises(Exception):
+            generator.generate_id()
+        self.assertEqual(generator.stats['clock_backward_errors'], 1)
+
+    def test_wait_policy_sleeps_until_clock_catches_up(self):
+        generator = self.make_generator(backward_policy='wait')
+        first = generator.generate_id()
+        self.now_ms -= 3
+        with patch('IdGenerator.time.sleep', side_effect=self.advance_clock) as sleep:
+            second = generator.generate_id()
+        self.assertGreater(second, first)
+        self.assertTrue(sleep.called)
+        self.assertEqual(generator.stats['clock_backward_waits'], 1)
+
+    def test_borrow_policy_reuses_last_timestamp(self):
+        generator = self.make_generator(backward_policy='borrow')
+        first = generator.generate_id()
+        self.now_ms -= 3
+        ids = [generator.generate_id() for _ in range(5000)]  # also overflows into a borrowed millisecond
+        self.assertEqual(ids, sorted(ids))
+        self.assertGreater(ids[0], first)
+        self.assertEqual(ids[0] >> 17, first >> 17)
+        self.assertEqual(ids[-1] >> 17, (first >> 17) + 1)
+        self.assertEqual(generator.stats['clock_backward_borrows'], 5000)
+
+    def test_large_backward_step_always_raises(self):
+        generator = self.make_generator(backward_policy='borrow', max_backward_ms=5)
+        generator.generate_id()
+        self.now_ms -= 6
+        with self.assertRaises(Exception):
+            generator.generate_id()
+
+    def test_overflow_sleeps_instead_of_spinning(self):
+        generator = self.make_generator()
+        with patch('IdGenerator.time.sleep', side_effect=self.advance_clock) as sleep:
+            ids = generator.generate_ids(10_000).tolist()
+        self.assertEqual(len(set(ids)), 10_000)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(generator.stats['sequence_overflows'], 2)
+
+
+class TestSnowflakeLayout(unittest.TestCase):
+    """
+    Tests for custom bit layouts: validation, and that generate_id places every field where the layout says.
+    """
+
+    def test_layout_must_fit_in_63_bits(self):
+        with self.assertRaises(ValueError):
+            SnowflakeLayout(timestamp_bits=42, datacenter_bits=5, worker_bits=5, sequence_bits=12)
+        SnowflakeLayout(timestamp_bits=41, datacenter_bits=5, worker_bits=5, sequence_bits=12)
+
+    def test_fields_follow_layout(self):
+        layout = SnowflakeLayout(timestamp_bits=40, datacenter_bits=3, worker_bits=6, sequence_bits=10,
+                                 epoch=1_600_000_000_000)
+        elapsed_ms = 100_000_000_000  # fits in 40 bits
+        generator = IdGenerator(worker_id=45, datacenter_id=5, layout=layout, clock=lambda: elapsed_ms * 1_000_000)
+        ids = [generator.generate_id() for _ in range(3)] + generator.generate_ids(3).tolist()
+        for sequence, new_id in enumerate(ids):
+            self.assertEqual(new_id >> 19, elapsed_ms)
+            self.assertEqual((new_id >> 16) & 7, 5)
+            self.assertEqual((new_id >> 10) & 63, 45)
+            self.assertEqual(new_id & 1023, sequence)
+
+    def test_clock_past_timestamp_range_is_rejected(self):
+        layout = SnowflakeLayout(31, 10, 10, 12)  # 31 bits of milliseconds last under 25 days
+        with self.assertRaises(ValueError):
+            IdGenerator(worker_id=1, layout=layout)
+
+        now_ms = [layout.max_timestamp - 1]
+        generator = IdGenerator(worker_id=1, layout=layout, clock=lambda: now_ms[0] * 1_000_000)
+        last = generator.generate_id()
+        self.assertEqual(layout.decode_id(last)['worker_id'], 1)
+        now_ms[0] += 2
+        with self.assertRaises(Exception):
+            generator.generate_id()
+        with self.assertRaises(Exception):
+            generator.generate_ids(10)
+        self.assertEqual(generator.stats['timestamp_overflows'], 2)
+        self.assertEqual(generator.stats['lease_expired_errors'], 0)
+        self.assertLess(last, 1 << 63)
+
+    def test_decode_round_trip(self):
+        layout = SnowflakeLayout(datacenter_bits=5)
+        now_ms = 1_700_000_000_123
+        generator = IdGenerator(worker_id=9, datacenter_id=17, layout=layout,
+                                clock=lambda: (now_ms - layout.epoch) * 1_000_000)
+        ids = generator.generate_ids(10)
+        fields = layout.decode_ids(ids)
+        self.assertTrue((fields['timestamp'] == now_ms).all())
+        self.assertTrue((fields['datacenter_id'] == 17).all())
+        self.assertTrue((fields['worker_id'] == 9).all())
+        self.assertEqual(fields['sequence'].tolist(), list(range(10)))
+        self.assertEqual(layout.decode_id(int(ids[3])),
+                         {'timestamp': now_ms, 'datacenter_id': 17, 'worker_id': 9, 'sequence': 3})
+
+    def test_id_bounds_cover_time_range(self):
+        layout = SnowflakeLayout()
+        generator = IdGenerator(worker_id=31, layout=layout, clock='wall')
+        start = time.time()
+        ids = generator.generate_ids(5000).tolist()
+        end = time.time()
+        low, high = layout.id_bounds(start, end)
+        self.assertTrue(all(low <= i <= high for i in ids))
+        self.assertGreater(layout.min_id(end + 1), ids[-1])
+
+    def test_ids_must_fit_layout(self):
+        layout = SnowflakeLayout(datacenter_bits=2)
+        with self.assertRaises(ValueError):
+            IdGenerator(worker_id=32, layout=layout)
+        with self.assertRaises(ValueError):
+            IdGenerator(worker_id=1, datacenter_id=4, layout=layout)
+
+
+class TestIdService(unittest.TestCase):
+    """
+    Round trip through a local IdServer: clients sharing one server never see the same ID twice.
+    """
+
+    def test_clients_get_unique_increasing_ids(self):
+        async def scenario():
+            server = IdServer(IdGenerator(worker_id=2), port=0)
+            await server.start()
+            clients = [IdClient(port=server.port, batch_size=500) for _ in range(3)]
+            for client in clients:
+                await client.connect()
+
+            async def draw(client):
+                return [await client.next_id() for _ in range(2000)]
+
+            try:
+                return await asyncio.gather(*(draw(client) for client in clients))
+            finally:
+                for client in clients:
+                    await client.close()
+                await server.close()
+
+        results = asyncio.run(scenario())
+        ids = [i for per_client in results for i in per_client]
+        self.assertEqual(len(ids), len(set(ids)))
+        for per_client in results:
+            self.assertEqual(per_client, sorted(per_client))
+
+    def test_callers_sharing_a_fetch_use_every_range(self):
+        client = IdClient(batch_size=4, low_water=0)
+
+        async def fetch():
+            await asyncio.sleep(0)
+            client._ranges.extend([(0, 2), (10, 12)])
+            client._available += 4
+
+        client._fetch = fetch
+
+        async def scenario():
+            return await asyncio.gather(*(client.next_id() for _ in range(4)))
+
+        self.assertEqual(sorted(asyncio.run(scenario())), [0, 1, 10, 11])
+
+    def test_empty_batches_are_rejected(self):
+        with self.assertRaises(ValueError):
+            IdClient(batch_size=0)
+        status, num_ranges = RESPONSE_HEADER.unpack(IdServer(IdGenerator(worker_id=2))._allocate(0))
+        self.assertEqual((status, num_ranges), (STATUS_ERROR, 0))
+
+
+class TestWorkerIdLease(unittest.TestCase):
+    """
+    Tests for worker ID leasing against the InMemoryRedis stand-in.
+    """
+
+    def test_leases_get_distinct_ids_in_one_round_trip(self):
+        store = InMemoryRedis()
+        calls = []
+        evaluate = store.eval
+        store.eval = lambda *args: calls.append(args[0]) or evaluate(*args)
+        leases = [WorkerIdLease(store, max_workers=4) for _ in range(4)]
+        try:
+            ids = [lease.acquire() for lease in leases]
+            self.assertEqual(sorted(ids), [0, 1, 2, 3])
+            self.assertEqual(len(calls), 4)
+            with self.assertRaises(RuntimeError):
+                WorkerIdLease(store, max_workers=4).acquire()
+        finally:
+            for lease in leases:
+                lease.release()
+        # Released IDs can be leased again.
+        with WorkerIdLease(store, max_workers=4) as lease:
+            self.assertIn(lease.worker_id, ids)
+
+    def test_renewals_send_script_hashes(self):
+        store = InMemoryRedis()
+        loaded, hashed = [], []
+        load, evaluate_sha = store.script_load, store.evalsha
+        store.script_load = lambda script: loaded.append(script) or load(script)
+        store.evalsha = lambda sha, *args: hashed.append(sha) or evaluate_sha(sha, *args)
+        lease = WorkerIdLease(store, renew_interval=60)
+        lease.acquire()
+        self.assertTrue(lease.renew())
+        self.assertTrue(lease.renew())
+        lease.release()
+        self.assertEqual(loaded, [EXTEND_SCRIPT, RELEASE_SCRIPT])
+        self.assertEqual(len(hashed), 3)
+        self.assertIsNone(store.get(lease._key(lease.worker_id)))
+
+    def test_generator_stops_when_lease_is_lost(self):
+        store = InMemoryRedis()
+        lease = WorkerIdLease(store, ttl=5.0, renew_interval=0.05)
+        generator = lease.generator()
+        generator.generate_id()
+        store.set(lease._key(lease.worker_id), 'someone-else')
+        time.sleep(0.2)
+        self.assertTrue(lease.lost)
+        with self.assertRaises(Exception):
+            generator.generate_id()
+        with self.assertRaises(Exception):
+            generator.generate_ids(10)
+        lease.release()
+
+    def test_generator_stops_when_lease_expires_unrenewed(self):
+        store = InMemoryRedis()
+        lease = WorkerIdLease(store, ttl=0.1, renew_interval=60)
+        generator = lease.generator()
+        generator.generate_id()
+        time.sleep(0.15)
+        with self.assertRaises(Exception):
+            generator.generate_id()
+        self.assertEqual(generator.stats['lease_expired_errors'], 1)
+        lease.release()
+
+
+def report_scaling(ids_per_thread=100_000):
+    """Prints IDs/sec for the striped generator and a single global lock as the thread count grows."""
+    print(f"{'threads':>8}{'striped IDs/s':>16}{'global lock IDs/s':>20}")
+    for num_threads in (1, 2, 4, 8, 16):
+        # Smallest stripe count that fits every thread, so each thread keeps as much sequence space as possible.
+        striped = StripedIdGenerator(worker_id=1, stripes=1 << (num_threads - 1).bit_length())
+        _, striped_elapsed = run_threads(striped.generate_id, num_threads, ids_per_thread)
+
+        single, lock = IdGenerator(worker_id=1), threading.Lock()
+
+        def locked_generate():
+            with lock:
+                return single.generate_id()
+
+        _, locked_elapsed = run_threads(locked_generate, num_threads, ids_per_thread)
+        total = num_threads * ids_per_thread
+        print(f"{num_threads:>8}{total / striped_elapsed:>16,.0f}{total / locked_elapsed:>20,.0f}")
+
+
+if __name__ == "__main__":
+    report_scaling()
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import threading
+import unittest
+from IdGenerator import IdGenerator
+from BlogService import BlogService
+from ShardStore import ShardStore
+
+
+def make_post(post_id, user_id=1):
+    return {'id': post_id, 'user_id': user_id, 'content': f"post {post_id} ✓"}
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.log'))
+
+
+class TestShardStore(unittest.TestCase):
+    """
+    Tests for the segmented append-only store: reads across segments, restarts and compaction.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_reads_across_segments_and_restart(self):
+        store = ShardStore(self.directory, segment_size=4096)
+        store.update((i, make_post(i, i % 7)) for i in range(1, 1001))
+        store[5] = make_post(5, user_id=99)
+        del store[6]
+        self.assertGreater(len(segment_files(self.directory)), 2)
+        self.assertEqual(store[5]['user_id'], 99)
+        self.assertNotIn(6, store)
+        self.assertEqual(len(store), 999)
+        store.close()
+
+        # Sealed segments come back from their footers, the active one from a scan.
+        store = ShardStore(self.directory, segment_size=4096)
+        self.assertEqual(store[1000], make_post(1000, 1000 % 7))
+        self.assertEqual(store[5]['user_id'], 99)
+        self.assertIsNone(store.get(6))
+        self.assertEqual(list(store)[:6], [1, 2, 3, 4, 5, 7])
+        store.close()
+
+    def test_torn_write_is_dropped(self):
+        store = ShardStore(self.directory)
+        store.update((i, make_post(i)) for i in range(1, 11))
+        store.close()
+        path = os.path.join(self.directory, segment_files(self.directory)[-1])
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)  # the last record is cut short
+
+        store = ShardStore(self.directory)
+        self.assertEqual(len(store), 9)
+        self.assertNotIn(10, store)
+        store[10] = make_post(10)
+        self.assertEqual(store[10], make_post(10))
+        store.close()
+
+    def test_compaction_keeps_newest_versions(self):
+        store = ShardStore(self.directory, segment_size=2048)
+        for version in range(3):
+            store.update((i, dict(make_post(i), content=f"v{version}")) for i in range(1, 201))
+        for i in range(1, 51):
+            del store[i]
+        size_before = sum(os.path.getsize(os.path.join(self.directory, f)) for f in segment_files(self.directory))
+        self.assertGreater(store.garbage_ratio(), 0.5)
+
+        self.assertGreater(store.compact(), 0)
+        size_after = sum(os.path.getsize(os.path.join(self.directory, f)) for f in segment_files(self.directory))
+        self.assertLess(size_after, size_before / 2)
+        self.assertEqual(store.garbage_ratio(), 0)
+        self.assertEqual(len(store), 150)
+        self.assertNotIn(1, store)
+        self.assertEqual(store[200]['content'], "v2")
+        store.close()
+
+        store = ShardStore(self.directory, segment_size=2048)
+        self.assertEqual(len(store), 150)
+        self.assertEqual(store[51]['content'], "v2")
+        store.close()
+
+    def test_concurrent_compactions(self):
+        store = ShardStore(self.directory, segment_size=1024)
+        errors = []
+
+        def run(action):
+            try:
+                for _ in range(20):
+                    action()
+            except Exception as e:
+                errors.append(e)
+
+        for version in range(5):
+            store.update((i, dict(make_post(i), content=f"v{version}")) for i in range(1, 101))
+            threads = [threading.Thread(target=run, args=(action,))
+                       for action in (store.compact, store.compact, store.garbage_ratio, store.live_index)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store), 100)
+        self.assertEqual(store[100]['content'], "v4")
+        store.close()
+
+        store = ShardStore(self.directory, segment_size=1024)
+        self.assertEqual(len(store), 100)
+        store.close()
+
+    def test_blog_service_survives_restart(self):
+        service = BlogService(4, IdGenerator(worker_id=1), storage_dir=self.directory)
+        posts = service.create_posts((user_id % 5, f"hello {user_id}") for user_id in range(100))
+        posts.append(service.create_post(3, "single"))
+        service.add_shards(1)
+        service.close()
+
+        service = BlogService(5, IdGenerator(worker_id=1), storage_dir=self.directory)
+        for post in posts:
+            self.assertEqual(service.get_post(post['user_id'], post['id']), post)
+        mine = sorted((p['id'] for p in posts if p['user_id'] == 3), reverse=True)
+        self.assertEqual([p['id'] for p in service.list_posts(3)], mine)
+        service.close()
+
+
+if __name__ == "__main__":
+    unittest.main()